@@ -3,7 +3,76 @@ import json
 import hashlib
 from datetime import datetime
 import sys
-from typing import Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from hpe_document_store import _dump_json_atomic, index_file_lock, replay_index_log
+
+# orjson is much faster than stdlib json for large indexes; fall back if missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Document types that have their own subdirectory under hpe_docs
+_DOC_TYPES = frozenset({"financial", "product", "press"})
+
+# Subdirectories already known to exist, so repeat runs skip the checks
+_ensured_subdirs = set()
+
+def _iter_document_files(top: str):
+    """
+    Yield paths of all .txt files under a directory tree.
+    
+    Uses os.scandir so file/dir checks come from the directory entry
+    instead of an extra stat() per file.
+    """
+    stack = [top]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and entry.name.endswith('.txt'):
+                        yield entry.path
+        except OSError as e:
+            print(f"Error scanning {current}: {e}")
+
+def _hash_file(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file, streamed in chunks."""
+    with open(file_path, 'rb') as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            h.update(chunk)
+        return h.hexdigest()
+
+def _try_hash_file(file_path: str) -> Tuple[Optional[str], Optional[os.stat_result], Optional[Exception]]:
+    """Hash and stat a file for use in a worker thread, returning (hash, stats, error)."""
+    try:
+        return _hash_file(file_path), os.stat(file_path), None
+    except Exception as e:
+        return None, None, e
+
+def _stat_matches(doc_info: Dict[str, Any], file_path: str) -> bool:
+    """
+    Check a file against the size and mtime recorded for an index entry.
+    
+    Entries without a recorded mtime (anything not created by a repair)
+    are assumed to match.
+    """
+    metadata = doc_info.get("metadata", {})
+    if "mtime" not in metadata:
+        return True
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return False
+    return st.st_size == metadata.get("file_size") and st.st_mtime == metadata["mtime"]
 
 def repair_document_index(hpe_docs_dir: str, verbose: bool = False) -> Tuple[int, int, int]:
     """
@@ -25,18 +94,35 @@ def repair_document_index(hpe_docs_dir: str, verbose: bool = False) -> Tuple[int
     
     index_path = os.path.join(hpe_docs_dir, "document_index.json")
     
+    # Running stores append to the log; keep them out until the repair is saved
+    with index_file_lock(index_path):
+        return _repair_locked(hpe_docs_dir, index_path, verbose)
+
+def _repair_locked(hpe_docs_dir: str, index_path: str, verbose: bool) -> Tuple[int, int, int]:
+    """Body of repair_document_index, run while holding the index lock."""
     # Try to load the existing index
     document_index = {}
-    if os.path.exists(index_path):
-        try:
+    try:
+        if orjson is not None:
+            with open(index_path, 'rb') as f:
+                document_index = orjson.loads(f.read())
+        else:
             with open(index_path, 'r') as f:
                 document_index = json.load(f)
-            if verbose:
-                print(f"Loaded existing index with {len(document_index)} entries")
-        except Exception as e:
-            print(f"Error loading document index: {e}")
-            print("Creating a new index")
-            document_index = {}
+        if verbose:
+            print(f"Loaded existing index with {len(document_index)} entries")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error loading document index: {e}")
+        print("Creating a new index")
+        document_index = {}
+    
+    # Apply mutations HPEDocumentStore has logged since its last compaction
+    log_path = index_path + ".log"
+    replayed = replay_index_log(document_index, log_path)
+    if verbose and replayed:
+        print(f"Replayed {replayed} logged index updates")
     
     # Find subdirectories
     subdirs = [
@@ -45,73 +131,99 @@ def repair_document_index(hpe_docs_dir: str, verbose: bool = False) -> Tuple[int
         os.path.join(hpe_docs_dir, "press")
     ]
     
-    # Make sure subdirectories exist
+    # Make sure subdirectories exist (only checked once per process)
     for subdir in subdirs:
-        if not os.path.exists(subdir):
+        if subdir in _ensured_subdirs:
+            continue
+        if not os.path.isdir(subdir):
             os.makedirs(subdir, exist_ok=True)
+        _ensured_subdirs.add(subdir)
     
     # Find all document files
-    all_files = []
-    for root, dirs, files in os.walk(hpe_docs_dir):
-        for file in files:
-            if file.endswith('.txt') and not file == "document_index.json":
-                filepath = os.path.join(root, file)
-                all_files.append(filepath)
+    all_files = list(_iter_document_files(hpe_docs_dir))
     
     if verbose:
         print(f"Found {len(all_files)} document files on disk")
     
     # Track document paths in the index
-    indexed_paths = set()
-    for doc_id, doc_info in document_index.items():
-        indexed_paths.add(doc_info["path"])
-    
-    # Files that exist but aren't in the index
-    missing_from_index = []
-    for file_path in all_files:
-        if file_path not in indexed_paths:
-            missing_from_index.append(file_path)
-    
-    # Files in the index that don't exist
-    missing_from_disk = []
-    for doc_id, doc_info in list(document_index.items()):
-        if not os.path.exists(doc_info["path"]):
-            missing_from_disk.append(doc_id)
+    indexed_paths = {doc_info["path"] for doc_info in document_index.values()}
+    on_disk = set(all_files)
+    
+    # Files that exist but aren't in the index (keeps scan order)
+    missing_from_index = [file_path for file_path in all_files if file_path not in indexed_paths]
+    
+    # Files in the index that don't exist. Anything found by the scan is known
+    # to exist, so only the remaining paths need an existence check.
+    stale_paths = {path for path in indexed_paths - on_disk if not os.path.exists(path)}
+    missing_from_disk = [doc_id for doc_id, doc_info in document_index.items()
+                         if doc_info["path"] in stale_paths]
     
     if verbose:
         print(f"Found {len(missing_from_index)} files missing from index")
         print(f"Found {len(missing_from_disk)} index entries with missing files")
     
-    # Add missing files to index
-    added_count = 0
+    # Store files are named <doc_id>.txt, so a file whose name matches an entry
+    # with a missing path is that document after a move. Point the entry at the
+    # new location instead of dropping it and re-hashing the file.
+    stale_ids = set(missing_from_disk)
+    to_hash = []
+    relocated_count = 0
     for file_path in missing_from_index:
+        doc_id = os.path.splitext(os.path.basename(file_path))[0]
+        if doc_id in stale_ids and _stat_matches(document_index[doc_id], file_path):
+            document_index[doc_id]["path"] = file_path
+            stale_ids.discard(doc_id)
+            relocated_count += 1
+            if verbose:
+                print(f"Updated path of {doc_id} to {file_path}")
+        else:
+            to_hash.append(file_path)
+    missing_from_disk = [doc_id for doc_id in missing_from_disk if doc_id in stale_ids]
+    
+    if verbose and relocated_count:
+        print(f"Updated paths of {relocated_count} moved documents")
+    
+    # Hash new files in parallel; file reads and hashlib both release the GIL
+    if to_hash:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            hash_results = list(executor.map(_try_hash_file, to_hash))
+    else:
+        hash_results = []
+    
+    # Add missing files to index, reading the clock once for the whole batch
+    now = datetime.now()
+    now_ts = now.strftime("%Y%m%d%H%M%S")
+    now_iso = now.isoformat()
+    repair_metadata = {
+        "source": "auto_repair",
+        "repaired_at": now_iso
+    }
+    
+    added_count = 0
+    for file_path, (content_hash, file_stats, hash_error) in zip(to_hash, hash_results):
+        if hash_error is not None:
+            print(f"Error adding {file_path} to index: {hash_error}")
+            continue
+        
+        # Determine document type from the top-level subdirectory
+        top_dir = os.path.relpath(file_path, hpe_docs_dir).split(os.sep, 1)[0]
+        doc_type = top_dir if top_dir in _DOC_TYPES else "other"
+        
         try:
-            # Determine document type from path
-            if "/financial/" in file_path:
-                doc_type = "financial"
-            elif "/product/" in file_path:
-                doc_type = "product"
-            elif "/press/" in file_path:
-                doc_type = "press"
-            else:
-                doc_type = "other"
-            
             # Generate an ID
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                content_hash = hashlib.md5(content).hexdigest()
-            
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            doc_id = f"{doc_type}_{timestamp}_{content_hash[:8]}"
+            doc_id = f"{doc_type}_{now_ts}_{content_hash[:8]}"
             
             # Add to index
             document_index[doc_id] = {
                 "path": file_path,
                 "type": doc_type,
-                "added": datetime.now().isoformat(),
+                "added": now_iso,
+                "content_hash": content_hash,
                 "metadata": {
-                    "source": "auto_repair",
-                    "repaired_at": datetime.now().isoformat()
+                    **repair_metadata,
+                    "file_size": file_stats.st_size,
+                    "mtime": file_stats.st_mtime
                 }
             }
             
@@ -133,9 +245,13 @@ def repair_document_index(hpe_docs_dir: str, verbose: bool = False) -> Tuple[int
     
     # Save the repaired index
     try:
-        with open(index_path, 'w') as f:
-            json.dump(document_index, f, indent=2)
+        _dump_json_atomic(index_path, document_index)
         print(f"Saved repaired index with {len(document_index)} entries")
+        
+        # The saved snapshot now includes the logged updates. Truncate rather
+        # than delete, so stores holding the log open keep appending to it.
+        if replayed:
+            os.truncate(log_path, 0)
     except Exception as e:
         print(f"Error saving repaired index: {e}")
     
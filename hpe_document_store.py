@@ -1,10 +1,32 @@
 import os
 import json
+import asyncio
+import mmap
 import re
 from datetime import datetime
 import hashlib
+import heapq
 import logging
-from typing import List, Dict, Any, Optional
+import tempfile
+import threading
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Union
+
+# orjson serializes index records much faster than stdlib json; fall back if missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Store instances in separate processes share the index files; fcntl locks
+# serialize their log appends and compactions (POSIX only)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Try to import the PDF handler
 PDF_SUPPORT = False
@@ -21,6 +43,192 @@ logging.basicConfig(
 )
 logger = logging.getLogger("HPEDocStore")
 
+# Tokenizer shared by indexing and search
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_TOKEN_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+# Filename keywords for text documents imported without a type, in order of precedence
+_TYPE_KEYWORDS = (
+    ("financial", ("financial", "earnings", "revenue")),
+    ("product", ("product", "service", "greenlake")),
+    ("press", ("press", "news", "release")),
+)
+
+# The index mutation log is compacted into document_index.json once it grows
+# past twice the snapshot size (and at least this many bytes)
+INDEX_LOG_MIN_COMPACT_BYTES = 64 * 1024
+
+# Maximum number of document contents kept in the in-memory LRU cache
+CONTENT_CACHE_SIZE = 512
+
+# Maximum number of search_documents result lists kept in memory
+SEARCH_CACHE_SIZE = 4096
+
+# Characters per chunk when streaming text files into the store
+CHUNK_SIZE = 1 << 20
+
+# Files imported at once by aimport_documents
+IMPORT_CONCURRENCY = 8
+
+def _tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric terms."""
+    return _TOKEN_RE.findall(text.lower())
+
+def _infer_doc_type(path: str) -> str:
+    """Guess a document type from keywords in a file path."""
+    path_lower = path.lower()
+    for doc_type, keywords in _TYPE_KEYWORDS:
+        for keyword in keywords:
+            if keyword in path_lower:
+                return doc_type
+    return "other"
+
+def _read_text(path: str) -> str:
+    """Read a UTF-8 text file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _iter_text_chunks(path: str, size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield a UTF-8 text file in chunks of up to `size` characters."""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+def _as_chunks(content: Union[str, Iterable[str]]) -> Iterable[str]:
+    """Treat a plain string as a single chunk."""
+    return (content,) if isinstance(content, str) else content
+
+def _write_chunks(path: str, chunks: Iterable[str]) -> Tuple[str, Counter]:
+    """
+    Stream text chunks to a file, hashing and tokenizing them on the way.
+    
+    Tokens split across a chunk boundary are carried into the next chunk.
+    
+    Returns:
+        Tuple of (SHA-256 hex digest, term counts)
+    """
+    content_hash = hashlib.sha256()
+    term_counts = Counter()
+    carry = ""
+    
+    with open(path, 'w', encoding='utf-8') as out:
+        for chunk in chunks:
+            content_hash.update(chunk.encode())
+            out.write(chunk)
+            
+            text = carry + chunk.lower()
+            head = text.rstrip(_TOKEN_CHARS)
+            carry = text[len(head):]
+            term_counts.update(_TOKEN_RE.findall(head))
+    
+    if carry:
+        term_counts[carry] += 1
+    return content_hash.hexdigest(), term_counts
+
+def hash_content(content: str) -> str:
+    """SHA-256 hex digest of document text, as stored in the index's content_hash."""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def _chain_ranked(top: List[str], scores: Dict[str, int]) -> Iterator[str]:
+    """Yield the preselected top ids, then the remaining ids in full ranked order."""
+    yield from top
+    yield from sorted(scores, key=scores.get, reverse=True)[len(top):]
+
+def _remove_quietly(path: str) -> None:
+    """Delete a file if it exists."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _load_json(path: str) -> Any:
+    """
+    Load a JSON file, parsing a read-only memory map with orjson when installed.
+    """
+    with open(path, 'rb') as f:
+        if orjson is None or os.fstat(f.fileno()).st_size == 0:
+            return json.load(f)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return orjson.loads(view)
+            finally:
+                view.release()
+
+def _dump_json_atomic(path: str, obj: Any) -> None:
+    """
+    Write a compact JSON file via a temporary file, fsync and os.replace.
+    
+    The temporary file has a unique name, so concurrent writers (e.g. store
+    instances in other processes) never write into each other's file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                    prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        if orjson is not None:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps(obj))
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(obj, f)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+def replay_index_log(document_index: Dict[str, Dict[str, Any]], log_path: str) -> int:
+    """
+    Apply the mutations recorded in an index log to a loaded index snapshot.
+    
+    Each log line is a JSON record {"op": "add" | "del", "doc_id": ..., "info": ...}.
+    A truncated final line (e.g. from an interrupted write) is ignored.
+    
+    Args:
+        document_index: Index loaded from document_index.json, updated in place
+        log_path: Path of the mutation log
+        
+    Returns:
+        Number of records applied
+    """
+    applied = 0
+    try:
+        with open(log_path, 'rb') as f:
+            for line in f:
+                try:
+                    record = orjson.loads(line) if orjson is not None else json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable record in {log_path}")
+                    continue
+                if record.get("op") == "add":
+                    document_index[record["doc_id"]] = record["info"]
+                elif record.get("op") == "del":
+                    document_index.pop(record["doc_id"], None)
+                applied += 1
+    except FileNotFoundError:
+        pass
+    return applied
+
+@contextmanager
+def index_file_lock(index_path: str) -> Iterator[None]:
+    """
+    Hold the exclusive lock HPEDocumentStore takes on an index's files.
+    
+    For tools that rewrite document_index.json or its log outside a store.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(index_path + ".lock", 'a') as lock_fh:
+        fcntl.flock(lock_fh, fcntl.LOCK_EX)
+        yield
+
 class HPEDocumentStore:
     """
     Manages a collection of HPE documents for use in query refinement and RAG workflows.
@@ -53,32 +261,252 @@ class HPEDocumentStore:
         
         # Load document index if it exists
         self.index_path = os.path.join(self.data_dir, "document_index.json")
-        self.document_index = self._load_index()
+        self.index_log_path = self.index_path + ".log"
+        self._lock_fh = None
+        with self._index_lock():
+            self.document_index = self._load_index()
+            replay_index_log(self.document_index, self.index_log_path)
+        
+        # Document IDs per type, backing type-filtered search and get_document_stats
+        self._by_type: Dict[str, set] = defaultdict(set)
+        for doc_id, info in self.document_index.items():
+            self._by_type[info.get("type", "other")].add(doc_id)
+        
+        # Content hash -> doc_id, so re-adding identical content reuses the entry
+        self._hash_to_id: Dict[str, str] = {
+            info["content_hash"]: doc_id
+            for doc_id, info in self.document_index.items() if info.get("content_hash")
+        }
+        
+        # Mutations are appended to the log; the snapshot is rewritten on compact()
+        self._log_fh = None
+        self._snapshot_bytes = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        self._log_bytes = os.path.getsize(self.index_log_path) if os.path.exists(self.index_log_path) else 0
+        
+        # Inverted index (term -> {doc_id: term frequency}) used by search_documents.
+        # Like the document index it is only rewritten on compact(); documents
+        # added or removed since the last write are reconciled on load.
+        self._inverted_dirty = False
+        self.inverted_index_path = os.path.join(self.data_dir, "inverted_index.json")
+        self.inverted_index: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self._load_inverted_index()
+        
+        # Bumped on every mutation so callers can invalidate derived caches
+        self._version = 0
+        
+        # LRU of doc_id -> (mtime_ns, size, content) for get_document
+        self._content_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        
+        # LRU of normalized search -> results, valid for the current version only
+        self._search_cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self._search_cache_version = self._version
+        
+        # Guards both LRU caches, which reader threads (e.g. a refiner shared
+        # by a thread pool) reorder and evict concurrently
+        self._cache_lock = threading.Lock()
         
         logger.info(f"Initialized HPE Document Store at {self.data_dir}")
         logger.info(f"Document index contains {len(self.document_index)} documents")
     
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever documents are added or deleted."""
+        return self._version
+    
     def _load_index(self) -> Dict[str, Dict[str, Any]]:
         """Load document index from disk or create a new one if it doesn't exist."""
         if os.path.exists(self.index_path):
             try:
-                with open(self.index_path, 'r') as f:
-                    return json.load(f)
+                return _load_json(self.index_path)
             except Exception as e:
                 logger.error(f"Error loading document index: {e}")
                 return {}
         return {}
     
-    def _save_index(self) -> None:
-        """Save document index to disk."""
+    @contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the index files against other store processes."""
+        if fcntl is None:
+            yield
+            return
+        if self._lock_fh is None:
+            self._lock_fh = open(self.index_path + ".lock", 'a')
+        fcntl.flock(self._lock_fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fh, fcntl.LOCK_UN)
+    
+    def _save_index(self, document_index: Dict[str, Dict[str, Any]]) -> None:
+        """Write a full snapshot of a document index to disk atomically."""
         try:
-            with open(self.index_path, 'w') as f:
-                json.dump(self.document_index, f, indent=2)
+            _dump_json_atomic(self.index_path, document_index)
+            self._snapshot_bytes = os.path.getsize(self.index_path)
         except Exception as e:
             logger.error(f"Error saving document index: {e}")
+            raise
+    
+    def _log_mutation(self, op: str, doc_id: str, info: Dict[str, Any] = None) -> None:
+        """
+        Append an index mutation to the log instead of rewriting the snapshot.
+        
+        Compacts once the log outgrows the snapshot.
+        """
+        record = {"op": op, "doc_id": doc_id}
+        if info is not None:
+            record["info"] = info
+        
+        line = (orjson.dumps(record) if orjson is not None
+                else json.dumps(record).encode('utf-8')) + b"\n"
+        
+        try:
+            with self._index_lock():
+                if self._log_fh is None:
+                    self._log_fh = open(self.index_log_path, 'ab', buffering=1 << 16)
+                    self._terminate_partial_record()
+                self._log_fh.write(line)
+                self._log_fh.flush()
+                # The log is shared, so take its size from the file rather than counting
+                self._log_bytes = self._log_fh.tell()
+        except Exception as e:
+            logger.error(f"Error writing document index log: {e}")
+            return
+        
+        if self._log_bytes > 2 * max(self._snapshot_bytes, INDEX_LOG_MIN_COMPACT_BYTES):
+            self.compact()
+    
+    def _terminate_partial_record(self) -> None:
+        """End a truncated last log line so the next record starts on its own line."""
+        if self._log_fh.tell() == 0:
+            return
+        with open(self.index_log_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                self._log_fh.write(b"\n")
+    
+    def compact(self) -> None:
+        """
+        Fold the mutation log into document_index.json and truncate the log.
+        
+        The snapshot is rebuilt from what is on disk, not from this instance's
+        view, so records other store processes have appended are kept. The log
+        is truncated in place rather than removed, so their open handles keep
+        appending to the live file.
+        """
+        with self._index_lock():
+            try:
+                document_index = _load_json(self.index_path)
+            except FileNotFoundError:
+                document_index = {}
+            except Exception as e:
+                logger.error(f"Error loading document index for compaction: {e}")
+                return  # Keep the log; it still holds the mutations
+            replay_index_log(document_index, self.index_log_path)
+            
+            try:
+                self._save_index(document_index)
+            except Exception:
+                return  # Keep the log; it still holds the mutations
+            
+            try:
+                os.truncate(self.index_log_path, 0)
+            except FileNotFoundError:
+                pass
+            self._log_bytes = 0
+        
+        if self._inverted_dirty:
+            self._save_inverted_index()
+    
+    def close(self) -> None:
+        """Flush pending index state to disk (compacting the log) and release file handles."""
+        if self._log_bytes or self._inverted_dirty:
+            self.compact()
+        if self._log_fh is not None:
+            self._log_fh.close()
+            self._log_fh = None
+        if self._lock_fh is not None:
+            self._lock_fh.close()
+            self._lock_fh = None
+    
+    def _load_inverted_index(self) -> None:
+        """
+        Load the inverted index from disk and bring it in line with the
+        document index (documents added or removed outside the store,
+        e.g. by fix_document_index.py, are indexed or dropped).
+        """
+        if os.path.exists(self.inverted_index_path):
+            try:
+                data = _load_json(self.inverted_index_path)
+                self.inverted_index = data.get("postings", {})
+                # Indexed documents, including ones with no terms
+                self.doc_terms = {doc_id: [] for doc_id in data.get("documents", ())}
+            except Exception as e:
+                logger.error(f"Error loading inverted index: {e}")
+                self.inverted_index = {}
+                self.doc_terms = {}
+        
+        for term, postings in self.inverted_index.items():
+            for doc_id in postings:
+                self.doc_terms.setdefault(doc_id, []).append(term)
+        
+        indexed = set(self.doc_terms)
+        current = set(self.document_index)
+        stale = indexed - current
+        missing = current - indexed
+        
+        for doc_id in stale:
+            self._unindex_document(doc_id)
+        
+        unreadable = 0
+        for doc_id in missing:
+            try:
+                with open(self.document_index[doc_id]["path"], 'r', encoding='utf-8') as f:
+                    self._index_document(doc_id, f.read())
+            except Exception:
+                unreadable += 1
+        
+        if unreadable:
+            logger.warning(f"Could not read {unreadable} indexed documents for search indexing")
+        
+        if stale or len(missing) > unreadable:
+            self._save_inverted_index()
+    
+    def _save_inverted_index(self) -> None:
+        """Save the inverted index to disk, under the index lock."""
+        try:
+            with self._index_lock():
+                _dump_json_atomic(self.inverted_index_path,
+                                  {"postings": self.inverted_index, "documents": list(self.doc_terms)})
+            self._inverted_dirty = False
+        except Exception as e:
+            logger.error(f"Error saving inverted index: {e}")
+    
+    def _index_document(self, doc_id: str, content: str) -> None:
+        """Add a document's term frequencies to the inverted index."""
+        self._index_terms(doc_id, Counter(_tokenize(content)))
+    
+    def _index_terms(self, doc_id: str, term_counts: Counter) -> None:
+        """Add precomputed term frequencies for a document to the inverted index."""
+        if doc_id in self.doc_terms:
+            self._unindex_document(doc_id)
+        
+        for term, tf in term_counts.items():
+            self.inverted_index.setdefault(term, {})[doc_id] = tf
+        
+        self.doc_terms[doc_id] = list(term_counts)
+    
+    def _unindex_document(self, doc_id: str) -> None:
+        """Remove a document from the inverted index."""
+        for term in self.doc_terms.pop(doc_id, []):
+            postings = self.inverted_index.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.inverted_index[term]
     
     def add_document(self, 
-                     content: str, 
+                     content: Union[str, Iterable[str]], 
                      doc_type: str = "financial", 
                      metadata: Dict[str, Any] = None,
                      doc_id: str = None) -> str:
@@ -86,10 +514,12 @@ class HPEDocumentStore:
         Add a document to the store.
         
         Args:
-            content: The document content
+            content: The document content, or an iterable of text chunks that
+                is streamed to disk without holding the whole document in memory
             doc_type: Type of document (financial, product, press)
             metadata: Additional metadata about the document
-            doc_id: Optional document ID. If not provided, one will be generated.
+            doc_id: Optional document ID. If not provided, one will be generated,
+                or the ID of an existing document with identical content is returned.
             
         Returns:
             The document ID
@@ -97,45 +527,176 @@ class HPEDocumentStore:
         if metadata is None:
             metadata = {}
         
-        # Generate document ID if not provided
-        if doc_id is None:
-            content_hash = hashlib.md5(content.encode()).hexdigest()
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            doc_id = f"{doc_type}_{timestamp}_{content_hash[:8]}"
+        doc_dir = self._document_dir(doc_type)
+        tmp_path = os.path.join(doc_dir, f".{uuid.uuid4().hex}.tmp")
+        
+        # Save document content
+        try:
+            content_hash, term_counts = _write_chunks(tmp_path, _as_chunks(content))
+        except Exception as e:
+            logger.error(f"Error saving document content: {e}")
+            _remove_quietly(tmp_path)
+            return None
+        
+        return self._finish_document(tmp_path, doc_dir, content_hash, term_counts,
+                                     doc_type, metadata, doc_id)
+    
+    async def aadd_document(self,
+                            content: Union[str, Iterable[str]],
+                            doc_type: str = "financial",
+                            metadata: Dict[str, Any] = None,
+                            doc_id: str = None) -> str:
+        """
+        Async variant of add_document.
         
-        # Determine document directory based on type
+        The content file is written in a worker thread so many documents can
+        be added concurrently with asyncio.gather; index updates stay on the
+        event loop thread.
+        """
+        if metadata is None:
+            metadata = {}
+        
+        doc_dir = self._document_dir(doc_type)
+        tmp_path = os.path.join(doc_dir, f".{uuid.uuid4().hex}.tmp")
+        
+        # Save document content
+        try:
+            content_hash, term_counts = await asyncio.to_thread(
+                _write_chunks, tmp_path, _as_chunks(content))
+        except Exception as e:
+            logger.error(f"Error saving document content: {e}")
+            _remove_quietly(tmp_path)
+            return None
+        
+        return self._finish_document(tmp_path, doc_dir, content_hash, term_counts,
+                                     doc_type, metadata, doc_id)
+    
+    def add_many(self, doc_type: str,
+                 docs: Iterable[Tuple[Union[str, Iterable[str]], Optional[Dict[str, Any]]]]) -> List[Optional[str]]:
+        """
+        Add a batch of documents of one type.
+        
+        The target directory and timestamp are resolved once for the batch.
+        Each add is still written to the index log, so the batch survives a
+        failed save; the log is compacted into the snapshot once at the end.
+        
+        Args:
+            doc_type: Type of all documents in the batch (financial, product, press)
+            docs: Iterable of (content, metadata) pairs; content may be a string
+                or an iterable of text chunks
+            
+        Returns:
+            Document IDs in input order (None for documents that failed)
+        """
+        doc_dir = self._document_dir(doc_type)
+        now = datetime.now()
+        doc_ids = []
+        
+        for content, metadata in docs:
+            tmp_path = os.path.join(doc_dir, f".{uuid.uuid4().hex}.tmp")
+            try:
+                content_hash, term_counts = _write_chunks(tmp_path, _as_chunks(content))
+            except Exception as e:
+                logger.error(f"Error saving document content: {e}")
+                _remove_quietly(tmp_path)
+                doc_ids.append(None)
+                continue
+            
+            doc_ids.append(self._finish_document(tmp_path, doc_dir, content_hash, term_counts,
+                                                 doc_type, metadata or {}, None, now=now))
+        
+        if any(doc_ids):
+            self.compact()
+        return doc_ids
+    
+    def _document_dir(self, doc_type: str) -> str:
+        """Return the directory documents of a given type are stored in."""
         if doc_type == "financial":
-            doc_dir = self.financial_dir
+            return self.financial_dir
         elif doc_type == "product":
-            doc_dir = self.product_dir
+            return self.product_dir
         elif doc_type == "press":
-            doc_dir = self.press_dir
-        else:
-            doc_dir = self.data_dir
+            return self.press_dir
+        return self.data_dir
+    
+    def _finish_document(self, tmp_path: str, doc_dir: str, content_hash: str,
+                         term_counts: Counter, doc_type: str,
+                         metadata: Dict[str, Any], doc_id: Optional[str],
+                         now: datetime = None) -> Optional[str]:
+        """Move a written document into place and add it to the index."""
+        if now is None:
+            now = datetime.now()
+        
+        # Identical content without an explicit ID maps to the existing document
+        if doc_id is None:
+            existing_id = self.find_by_content_hash(content_hash)
+            if existing_id is not None:
+                _remove_quietly(tmp_path)
+                logger.info(f"Document content matches existing document {existing_id}")
+                return existing_id
+        
+        # Generate document ID if not provided
+        if doc_id is None:
+            timestamp = now.strftime("%Y%m%d%H%M%S")
+            doc_id = f"{doc_type}_{timestamp}_{content_hash[:8]}"
         
-        # Save document content
         doc_path = os.path.join(doc_dir, f"{doc_id}.txt")
         try:
-            with open(doc_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            os.replace(tmp_path, doc_path)
         except Exception as e:
             logger.error(f"Error saving document content: {e}")
+            _remove_quietly(tmp_path)
             return None
         
-        # Add to index
+        # Add to index (replacing an entry with the same ID)
+        previous = self.document_index.get(doc_id)
+        if previous is not None:
+            self._by_type[previous.get("type", "other")].discard(doc_id)
+            self._forget_hash(doc_id, previous)
+        self._by_type[doc_type].add(doc_id)
+        self._hash_to_id[content_hash] = doc_id
         self.document_index[doc_id] = {
             "path": doc_path,
             "type": doc_type,
-            "added": datetime.now().isoformat(),
+            "added": now.isoformat(),
+            "content_hash": content_hash,
             "metadata": metadata
         }
         
-        # Save updated index
-        self._save_index()
+        with self._cache_lock:
+            self._content_cache.pop(doc_id, None)
+        self._index_terms(doc_id, term_counts)
+        self._version += 1
+        
+        # Record the update in the index log
+        self._inverted_dirty = True
+        self._log_mutation("add", doc_id, self.document_index[doc_id])
         
         logger.info(f"Added document {doc_id} of type {doc_type}")
         return doc_id
     
+    def _forget_hash(self, doc_id: str, info: Dict[str, Any]) -> None:
+        """Drop a document's content hash mapping if it still points at it."""
+        content_hash = info.get("content_hash")
+        if content_hash and self._hash_to_id.get(content_hash) == doc_id:
+            del self._hash_to_id[content_hash]
+    
+    def find_by_content_hash(self, content_hash: str) -> Optional[str]:
+        """
+        Return the ID of the document whose content has this hash_content digest, if any.
+        
+        A match whose file has been deleted is dropped, so the content can be
+        added again.
+        """
+        doc_id = self._hash_to_id.get(content_hash)
+        if doc_id is None:
+            return None
+        info = self.document_index.get(doc_id)
+        if info is None or not os.path.exists(info["path"]):
+            del self._hash_to_id[content_hash]
+            return None
+        return doc_id
+    
     def add_document_from_file(self, file_path: str, doc_type: str = None, metadata: Dict[str, Any] = None) -> Optional[str]:
         """
         Add a document from a file (supports PDF and text files).
@@ -148,6 +709,47 @@ class HPEDocumentStore:
         Returns:
             Document ID if successful, None otherwise
         """
+        loaded = self._load_file_document(file_path, doc_type, metadata)
+        if loaded is None:
+            return None
+        return self.add_document(*loaded)
+    
+    async def aadd_document_from_file(self, file_path: str, doc_type: str = None,
+                                      metadata: Dict[str, Any] = None,
+                                      executor: Optional[Executor] = None) -> Optional[str]:
+        """
+        Async variant of add_document_from_file.
+        
+        Reading runs in a worker thread, so a batch of files can be imported
+        concurrently with asyncio.gather. PDFs are parsed on `executor` when
+        one is given (e.g. a shared process pool), otherwise in the thread.
+        """
+        pdf_result = None
+        if executor is not None and PDF_SUPPORT and file_path.lower().endswith('.pdf'):
+            try:
+                pdf_result = await asyncio.get_running_loop().run_in_executor(
+                    executor, process_pdf_document, file_path)
+            except Exception as e:
+                logger.error(f"Error reading PDF document: {e}")
+                return None
+        
+        loaded = await asyncio.to_thread(self._load_file_document, file_path, doc_type, metadata, pdf_result)
+        if loaded is None:
+            return None
+        return await self.aadd_document(*loaded)
+    
+    def _load_file_document(self, file_path: str, doc_type: str = None,
+                            metadata: Dict[str, Any] = None,
+                            pdf_result: Dict[str, Any] = None) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Read a text or PDF file and work out its document type and metadata.
+        
+        A PDF is parsed here unless its process_pdf_document result is passed
+        in as `pdf_result`.
+        
+        Returns:
+            Tuple of (content, document type, metadata), or None on failure
+        """
         if not os.path.exists(file_path):
             logger.error(f"File not found: {file_path}")
             return None
@@ -169,7 +771,8 @@ class HPEDocumentStore:
                 
             # Process PDF using the handler
             try:
-                pdf_result = process_pdf_document(file_path)
+                if pdf_result is None:
+                    pdf_result = process_pdf_document(file_path)
                 
                 if "error" in pdf_result:
                     logger.error(f"Error processing PDF: {pdf_result['error']}")
@@ -189,38 +792,68 @@ class HPEDocumentStore:
                     else:
                         doc_type = "financial"  # Default for this operation
                 
-                # Add to store
-                return self.add_document(content, doc_type, metadata)
+                return content, doc_type, metadata
             
             except Exception as e:
-                logger.error(f"Error adding PDF document: {e}")
+                logger.error(f"Error reading PDF document: {e}")
                 return None
         
         # Handle text files
         else:
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
+                # Streamed into the store chunk by chunk
+                content = _iter_text_chunks(file_path)
                 
                 # Determine document type if not specified
                 if doc_type is None:
-                    path_lower = file_path.lower()
-                    if any(term in path_lower for term in ['financial', 'earnings', 'revenue']):
-                        doc_type = "financial"
-                    elif any(term in path_lower for term in ['product', 'service', 'greenlake']):
-                        doc_type = "product"
-                    elif any(term in path_lower for term in ['press', 'news', 'release']):
-                        doc_type = "press"
-                    else:
-                        doc_type = "other"
+                    doc_type = _infer_doc_type(file_path)
                 
-                # Add to store
-                return self.add_document(content, doc_type, metadata)
+                return content, doc_type, metadata
             
             except Exception as e:
-                logger.error(f"Error adding text document: {e}")
+                logger.error(f"Error reading text document: {e}")
                 return None
     
+    def _cached_content(self, doc_id: str, stat: os.stat_result) -> Optional[str]:
+        """Return cached content if it matches the file's mtime and size."""
+        with self._cache_lock:
+            cached = self._content_cache.get(doc_id)
+            if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                self._content_cache.move_to_end(doc_id)
+                return cached[2]
+        return None
+    
+    def _cache_content(self, doc_id: str, stat: os.stat_result, content: str) -> None:
+        """Store content in the LRU cache, evicting the least recently used."""
+        with self._cache_lock:
+            self._content_cache[doc_id] = (stat.st_mtime_ns, stat.st_size, content)
+            self._content_cache.move_to_end(doc_id)
+            if len(self._content_cache) > CONTENT_CACHE_SIZE:
+                self._content_cache.popitem(last=False)
+    
+    def _read_content(self, doc_id: str, doc_path: str) -> str:
+        """
+        Read a document's content, serving unchanged files from the LRU cache.
+        
+        Cached entries are checked against the file's mtime and size, so a
+        stat replaces the read on a hit and edits on disk are picked up.
+        """
+        stat = os.stat(doc_path)
+        content = self._cached_content(doc_id, stat)
+        if content is None:
+            content = _read_text(doc_path)
+            self._cache_content(doc_id, stat, content)
+        return content
+    
+    async def _aread_content(self, doc_id: str, doc_path: str) -> str:
+        """Async variant of _read_content; the file read runs in a worker thread."""
+        stat = os.stat(doc_path)
+        content = self._cached_content(doc_id, stat)
+        if content is None:
+            content = await asyncio.to_thread(_read_text, doc_path)
+            self._cache_content(doc_id, stat, content)
+        return content
+    
     def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve a document by ID.
@@ -236,11 +869,33 @@ class HPEDocumentStore:
             return None
         
         doc_info = self.document_index[doc_id]
-        doc_path = doc_info["path"]
         
         try:
-            with open(doc_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_content(doc_id, doc_info["path"])
+            
+            return {
+                "id": doc_id,
+                "content": content,
+                "type": doc_info["type"],
+                "metadata": doc_info["metadata"],
+                "added": doc_info["added"]
+            }
+        except Exception as e:
+            logger.error(f"Error reading document {doc_id}: {e}")
+            return None
+    
+    async def aget_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Async variant of get_document; the file read runs in a worker thread.
+        """
+        if doc_id not in self.document_index:
+            logger.warning(f"Document {doc_id} not found in index")
+            return None
+        
+        doc_info = self.document_index[doc_id]
+        
+        try:
+            content = await self._aread_content(doc_id, doc_info["path"])
             
             return {
                 "id": doc_id,
@@ -278,15 +933,27 @@ class HPEDocumentStore:
             return False
         
         # Remove from index
+        self._by_type[self.document_index[doc_id].get("type", "other")].discard(doc_id)
+        self._forget_hash(doc_id, self.document_index[doc_id])
         del self.document_index[doc_id]
-        self._save_index()
+        with self._cache_lock:
+            self._content_cache.pop(doc_id, None)
+        self._unindex_document(doc_id)
+        self._version += 1
+        self._inverted_dirty = True
+        self._log_mutation("del", doc_id)
         
         logger.info(f"Deleted document {doc_id}")
         return True
     
     def search_documents(self, query: str, doc_type: str = None, limit: int = 10) -> List[Dict[str, Any]]:
         """
-        Simple keyword search across documents.
+        Keyword search across documents using the inverted index.
+        
+        The query and documents are split into lowercase alphanumeric tokens
+        and a document scores the number of times it contains each query
+        token. Terms match whole tokens only: "green" does not match
+        "greenlake", as it did when documents were scanned for substrings.
         
         Args:
             query: The search query
@@ -296,37 +963,70 @@ class HPEDocumentStore:
         Returns:
             List of matching documents
         """
-        results = []
-        search_terms = query.lower().split()
+        if limit <= 0:
+            return []
         
-        # For each document in the index
-        for doc_id, doc_info in self.document_index.items():
-            # Filter by type if specified
-            if doc_type and doc_info["type"] != doc_type:
+        query_terms = Counter(_tokenize(query))
+        
+        # Repeated searches are answered from the cache until the store changes
+        cache_key = (tuple(sorted(query_terms.items())), doc_type, limit)
+        with self._cache_lock:
+            if self._search_cache_version != self._version:
+                self._search_cache.clear()
+                self._search_cache_version = self._version
+            cached = self._search_cache.get(cache_key)
+            if cached is not None:
+                self._search_cache.move_to_end(cache_key)
+        if cached is not None:
+            return [dict(result) for result in cached]
+        
+        scores: Dict[str, int] = {}
+        get_score = scores.get
+        
+        # Only documents of the requested type are scored
+        candidates = self._by_type.get(doc_type, set()) if doc_type else None
+        
+        # Repeated query terms walk their posting list once, weighted by count
+        for term, query_tf in query_terms.items():
+            postings = self.inverted_index.get(term)
+            if not postings:
                 continue
             
-            # Load document content
+            if candidates is None:
+                # Plain counts over every document: the hot path
+                for doc_id, tf in postings.items():
+                    scores[doc_id] = get_score(doc_id, 0) + query_tf * tf
+            else:
+                for doc_id, tf in postings.items():
+                    if doc_id in candidates:
+                        scores[doc_id] = get_score(doc_id, 0) + query_tf * tf
+        
+        # Select the top scores and load only the documents that are returned;
+        # fall back to the full ranking if some of them cannot be read
+        results = []
+        ranked = heapq.nlargest(limit, scores, key=scores.get)
+        if len(ranked) < len(scores):
+            ranked = _chain_ranked(ranked, scores)
+        for doc_id in ranked:
+            if len(results) >= limit:
+                break
             doc = self.get_document(doc_id)
             if not doc:
                 continue
             
-            content = doc["content"].lower()
-            
-            # Simple matching algorithm - count term occurrences
-            score = sum(content.count(term) for term in search_terms)
-            
-            if score > 0:
-                results.append({
-                    "id": doc_id,
-                    "score": score,
-                    "content": doc["content"][:200] + "...",  # Preview
-                    "type": doc["type"],
-                    "metadata": doc["metadata"]
-                })
-        
-        # Sort by score and limit results
-        sorted_results = sorted(results, key=lambda x: x["score"], reverse=True)
-        return sorted_results[:limit]
+            results.append({
+                "id": doc_id,
+                "score": scores[doc_id],
+                "content": doc["content"][:200] + "...",  # Preview
+                "type": doc["type"],
+                "metadata": doc["metadata"]
+            })
+        
+        with self._cache_lock:
+            self._search_cache[cache_key] = results
+            if len(self._search_cache) > SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+        return [dict(result) for result in results]
     
     def get_documents_by_type(self, doc_type: str) -> List[Dict[str, Any]]:
         """
@@ -360,15 +1060,47 @@ class HPEDocumentStore:
             }
         }
         
-        for doc_info in self.document_index.values():
-            doc_type = doc_info.get("type", "other")
+        # Counts are maintained on add/delete, so this is O(number of types)
+        for doc_type, doc_ids in self._by_type.items():
             if doc_type in stats["by_type"]:
-                stats["by_type"][doc_type] += 1
+                stats["by_type"][doc_type] += len(doc_ids)
             else:
-                stats["by_type"]["other"] += 1
+                stats["by_type"]["other"] += len(doc_ids)
         
         return stats
 
+async def aimport_documents(store: HPEDocumentStore, file_paths: Iterable[str],
+                            doc_type: str = None,
+                            concurrency: int = IMPORT_CONCURRENCY,
+                            max_workers: Optional[int] = None) -> List[Optional[str]]:
+    """
+    Import files into a store concurrently.
+    
+    At most `concurrency` files are in flight at a time. PDF parsing is
+    CPU-bound, so PDFs are parsed in one shared process pool (each worker
+    extracts its document serially); text files are read in worker threads.
+    Index updates go to the mutation log; call store.close() afterwards to
+    write the index once for the whole batch.
+    
+    Args:
+        store: The document store to import into
+        file_paths: Paths of PDF or text files
+        doc_type: Type of document (if None, determined per file)
+        concurrency: Maximum number of files imported at once
+        max_workers: Number of PDF parsing processes (defaults to CPU count)
+        
+    Returns:
+        Document IDs in the order of file_paths (None for failed imports)
+    """
+    sem = asyncio.Semaphore(concurrency)
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        async def _aimport(path: str) -> Optional[str]:
+            async with sem:
+                return await store.aadd_document_from_file(path, doc_type, executor=pool)
+        
+        return await asyncio.gather(*(_aimport(path) for path in file_paths))
+
 
 # Example usage
 if __name__ == "__main__":
@@ -402,10 +1134,11 @@ if __name__ == "__main__":
         print(f"Found {len(pdf_files)} PDF files in financial directory. Would you like to import them? (y/n)")
         response = input().lower()
         if response == 'y':
-            for pdf_file in pdf_files:
-                pdf_path = os.path.join(financial_dir, pdf_file)
-                print(f"Importing {pdf_file}...")
-                doc_id = store.add_document_from_file(pdf_path, "financial")
+            print(f"Importing {len(pdf_files)} PDF files...")
+            pdf_paths = [os.path.join(financial_dir, pdf_file) for pdf_file in pdf_files]
+            doc_ids = asyncio.run(aimport_documents(store, pdf_paths, "financial"))
+            for pdf_file, doc_id in zip(pdf_files, doc_ids):
+                print(f"{pdf_file}:")
                 if doc_id:
                     print(f"  Imported as document ID: {doc_id}")
                 else:
@@ -434,3 +1167,5 @@ if __name__ == "__main__":
         print(f"Score: {result['score']}")
         print(f"Preview: {result['content']}")
         print("-" * 50)
+    
+    store.close()
@@ -1,13 +1,18 @@
 import argparse
+import asyncio
 import sys
 import os
 import time
 import json
 import logging
-from typing import List, Dict, Any
+from collections import OrderedDict
+from functools import cached_property
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 
 from hpe_document_store import HPEDocumentStore
-from hpe_rag_query_refiner import HPERAGQueryRefiner
+
+if TYPE_CHECKING:
+    from hpe_rag_query_refiner import HPERAGQueryRefiner
 
 # Set up logging
 logging.basicConfig(
@@ -20,6 +25,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger("HPEQueryWorkflow")
 
+# Maximum number of refined query results kept by process_query
+QUERY_CACHE_SIZE = 1024
+
+def _read_file(filepath: str) -> str:
+    """Read a UTF-8 text document."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
 class HPEQueryWorkflow:
     """
     Complete workflow for HPE query processing:
@@ -33,12 +47,23 @@ class HPEQueryWorkflow:
         # Initialize document store
         self.doc_store = HPEDocumentStore()
         
-        # Initialize RAG query refiner
-        self.query_refiner = HPERAGQueryRefiner(doc_store=self.doc_store)
+        # LRU of (normalized query, use_rag, store version) -> refinement result
+        self._query_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
         
         logger.info("HPE Query Workflow initialized")
         logger.info(f"Document store has {self.doc_store.get_document_stats()['total_documents']} documents")
     
+    @cached_property
+    def query_refiner(self) -> "HPERAGQueryRefiner":
+        """
+        RAG query refiner sharing this workflow's document store.
+        
+        Created (and the Gemini SDK imported) on first use, so the stats,
+        search and import commands start without it.
+        """
+        from hpe_rag_query_refiner import HPERAGQueryRefiner
+        return HPERAGQueryRefiner(doc_store=self.doc_store)
+    
     def import_document(self, filepath: str, doc_type: str, metadata: Dict[str, Any] = None) -> str:
         """
         Import a document from a file.
@@ -72,6 +97,64 @@ class HPEQueryWorkflow:
             logger.error(f"Error importing document {filepath}: {e}")
             return None
     
+    async def aimport_document(self, filepath: str, doc_type: str, metadata: Dict[str, Any] = None) -> Optional[str]:
+        """
+        Async variant of import_document; file IO runs in worker threads.
+        
+        Args:
+            filepath: Path to the document file
+            doc_type: Type of document (financial, product, press)
+            metadata: Additional metadata
+            
+        Returns:
+            Document ID if successful, None otherwise
+        """
+        if not os.path.exists(filepath):
+            logger.error(f"File not found: {filepath}")
+            return None
+        
+        try:
+            content = await asyncio.to_thread(_read_file, filepath)
+            
+            doc_id = await self.doc_store.aadd_document(
+                content=content,
+                doc_type=doc_type,
+                metadata=dict(metadata or {})
+            )
+            
+            logger.info(f"Imported document {filepath} as {doc_id}")
+            return doc_id
+        
+        except Exception as e:
+            logger.error(f"Error importing document {filepath}: {e}")
+            return None
+    
+    def import_documents(self, filepaths: List[str], doc_type: str,
+                         metadata: Dict[str, Any] = None) -> List[Optional[str]]:
+        """
+        Import several documents concurrently.
+        
+        A single file goes through import_document; the async path only pays
+        off when there are several files to overlap.
+        
+        Args:
+            filepaths: Paths to the document files
+            doc_type: Type of document (financial, product, press)
+            metadata: Additional metadata applied to every document
+            
+        Returns:
+            Document IDs (None for failed imports), in input order
+        """
+        if len(filepaths) <= 1:
+            return [self.import_document(filepath, doc_type, metadata) for filepath in filepaths]
+        
+        async def _import_all():
+            return await asyncio.gather(
+                *(self.aimport_document(filepath, doc_type, metadata) for filepath in filepaths)
+            )
+        
+        return asyncio.run(_import_all())
+    
     def process_query(self, query: str, use_rag: bool = True) -> Dict[str, Any]:
         """
         Process a user query through the workflow.
@@ -85,8 +168,21 @@ class HPEQueryWorkflow:
         """
         logger.info(f"Processing query: {query}")
         
+        # Repeated queries (ignoring case and whitespace) skip the model call
+        # until the document store changes
+        cache_key = (" ".join(query.lower().split()), use_rag, self.doc_store.version)
+        
         start_time = time.time()
-        result = self.query_refiner.refine_query(query, use_rag=use_rag)
+        cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            self._query_cache.move_to_end(cache_key)
+            result = dict(cached, original_query=query, from_cache="exact")
+        else:
+            result = self.query_refiner.refine_query(query, use_rag=use_rag)
+            if "error" not in result:
+                self._query_cache[cache_key] = dict(result)
+                if len(self._query_cache) > QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
         end_time = time.time()
         
         result["processing_time"] = end_time - start_time
@@ -214,7 +310,7 @@ def run_from_cli():
     
     # Import document
     import_parser = subparsers.add_parser("import", help="Import a document")
-    import_parser.add_argument("filepath", help="Path to the document file")
+    import_parser.add_argument("filepaths", nargs="+", help="Paths to the document files")
     import_parser.add_argument("--type", default="financial", help="Document type")
     import_parser.add_argument("--metadata", action="append", help="Metadata in key=value format")
     
@@ -247,11 +343,12 @@ def run_from_cli():
                     key, value = meta_item.split('=', 1)
                     metadata[key.strip()] = value.strip()
         
-        doc_id = workflow.import_document(args.filepath, args.type, metadata)
-        if doc_id:
-            print(f"Document imported successfully. ID: {doc_id}")
-        else:
-            print("Document import failed.")
+        doc_ids = workflow.import_documents(args.filepaths, args.type, metadata)
+        for filepath, doc_id in zip(args.filepaths, doc_ids):
+            if doc_id:
+                print(f"Document imported successfully. ID: {doc_id}")
+            else:
+                print(f"Document import failed: {filepath}")
     
     elif args.command == "stats":
         print(json.dumps(workflow.doc_store.get_document_stats(), indent=2))
@@ -267,6 +364,9 @@ def run_from_cli():
                 print()
         else:
             print("No matching documents found.")
+    
+    # Fold this run's index updates into the snapshot
+    workflow.doc_store.close()
 
 
 if __name__ == "__main__":
@@ -2,8 +2,11 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 import os
 import time
+import random
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 
 from hpe_document_store import HPEDocumentStore
 
@@ -11,6 +14,23 @@ from hpe_document_store import HPEDocumentStore
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("HPEQueryRefiner")
 
+# Maximum number of retrieved contexts kept per refiner
+CONTEXT_CACHE_SIZE = 256
+
+# Upper bound in seconds for the backoff between Gemini retries
+MAX_RETRY_DELAY = 30
+
+# API errors that indicate a bad request or credentials, where retrying is pointless
+try:
+    from google.api_core import exceptions as google_exceptions
+    NON_RETRIABLE_ERRORS = (
+        google_exceptions.InvalidArgument,
+        google_exceptions.PermissionDenied,
+        google_exceptions.Unauthenticated,
+    )
+except ImportError:
+    NON_RETRIABLE_ERRORS = ()
+
 class HPERAGQueryRefiner:
     """
     Enhanced HPE Query Refiner using Retrieval Augmented Generation (RAG) techniques
@@ -51,11 +71,22 @@ class HPERAGQueryRefiner:
             self.model = genai.GenerativeModel("gemini-1.0-pro")
             self.model_name = "gemini-1.0-pro"
         
+        # Built once and reused for every request
+        self._generation_config = genai.types.GenerationConfig(
+            temperature=0.1,
+            max_output_tokens=150,
+            top_p=0.95,
+        )
+        
         # Set up document store
         if doc_store is None:
             self.doc_store = HPEDocumentStore()
         else:
             self.doc_store = doc_store
+        
+        # LRU cache of retrieved context, keyed by (query, max_docs, store version)
+        self._context_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._context_lock = threading.Lock()
     
     def retrieve_relevant_context(self, query: str, max_docs: int = 3) -> str:
         """
@@ -68,23 +99,51 @@ class HPERAGQueryRefiner:
         Returns:
             Relevant context as a string
         """
+        cache_key = (query, max_docs, self.doc_store.version)
+        # The refiner may be shared by worker threads; the lock is not held
+        # while the context is built
+        with self._context_lock:
+            cached = self._context_cache.get(cache_key)
+            if cached is not None:
+                self._context_cache.move_to_end(cache_key)
+                return cached
+        
+        context = self._build_context(query, max_docs)
+        
+        with self._context_lock:
+            self._context_cache[cache_key] = context
+            if len(self._context_cache) > CONTEXT_CACHE_SIZE:
+                self._context_cache.popitem(last=False)
+        
+        return context
+    
+    def _build_context(self, query: str, max_docs: int) -> str:
+        """Search the document store and assemble the context string."""
         results = self.doc_store.search_documents(query, limit=max_docs)
         
         if not results:
             logger.info("No relevant documents found for context")
             return ""
         
-        # Extract content from results
-        context_parts = []
+        # Extract content from results, writing pieces straight into one buffer
+        buf = []
+        append = buf.append
+        get_document = self.doc_store.get_document
         for result in results:
             # Get full document content
-            doc = self.doc_store.get_document(result["id"])
-            if doc:
-                # Add metadata
-                meta_str = ", ".join([f"{k}: {v}" for k, v in doc["metadata"].items()])
-                context_parts.append(f"Document ({meta_str}):\n{doc['content']}\n")
+            doc = get_document(result["id"])
+            if not doc:
+                continue
+            if buf:
+                append("\n")
+            # Add metadata
+            append("Document (")
+            append(", ".join(f"{k}: {v}" for k, v in doc["metadata"].items()))
+            append("):\n")
+            append(doc["content"])
+            append("\n")
         
-        return "\n".join(context_parts)
+        return "".join(buf)
     
     def refine_query(self, user_query: str, use_rag: bool = True) -> Dict[str, Any]:
         """
@@ -118,11 +177,7 @@ class HPERAGQueryRefiner:
                 try:
                     response = self.model.generate_content(
                         prompt,
-                        generation_config={
-                            "temperature": 0.1,
-                            "max_output_tokens": 150,
-                            "top_p": 0.95,
-                        }
+                        generation_config=self._generation_config
                     )
                     
                     # Extract and clean the refined query
@@ -136,28 +191,34 @@ class HPERAGQueryRefiner:
                         "context_length": len(context)
                     }
                 
+                except NON_RETRIABLE_ERRORS as e:
+                    # Bad requests and auth failures won't succeed on retry
+                    logger.error(f"Non-retriable error during query refinement: {e}")
+                    return self._fallback_result(user_query, e)
+                
                 except Exception as e:
                     retry_count += 1
                     if retry_count >= max_retries:
                         logger.error(f"Error after {max_retries} attempts: {e}")
-                        return {
-                            "original_query": user_query,
-                            "refined_query": user_query,  # Return original as fallback
-                            "used_rag": False,
-                            "error": str(e)
-                        }
+                        return self._fallback_result(user_query, e)
                     
-                    logger.warning(f"Attempt {retry_count} failed: {e}. Retrying in 2 seconds...")
-                    time.sleep(2)
+                    # Exponential backoff with jitter to avoid retry stampedes
+                    delay = min(2 ** retry_count + random.random(), MAX_RETRY_DELAY)
+                    logger.warning(f"Attempt {retry_count} failed: {e}. Retrying in {delay:.1f} seconds...")
+                    time.sleep(delay)
         
         except Exception as e:
             logger.error(f"Error during query refinement: {e}")
-            return {
-                "original_query": user_query,
-                "refined_query": user_query,
-                "used_rag": False,
-                "error": str(e)
-            }
+            return self._fallback_result(user_query, e)
+    
+    def _fallback_result(self, user_query: str, error: Exception) -> Dict[str, Any]:
+        """Build the result returned when refinement fails."""
+        return {
+            "original_query": user_query,
+            "refined_query": user_query,  # Return original as fallback
+            "used_rag": False,
+            "error": str(error)
+        }
     
     def _create_basic_prompt(self, user_query: str) -> str:
         """Create a prompt for basic query refinement that outputs a single line refined query."""
@@ -1,10 +1,10 @@
 import os
 import argparse
 import json
-import glob
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 from src.hpe_document_store import HPEDocumentStore
 from pdf_document_handler import process_pdf_document
@@ -13,6 +13,32 @@ from pdf_document_handler import process_pdf_document
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("PDFImporter")
 
+# Filename keywords used to guess a document type, in order of precedence
+_DOC_TYPE_KEYWORDS = (
+    ("financial", ("financial", "earnings", "revenue", "quarter", "fiscal")),
+    ("product", ("product", "service", "greenlake", "offering")),
+    ("press", ("press", "news", "release", "announcement")),
+)
+
+
+def detect_doc_type(pdf_path: str, default: str = "financial") -> str:
+    """
+    Guess a document type from keywords in a file path.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        default: Type to use if no keyword matches
+        
+    Returns:
+        Document type string
+    """
+    path_lower = pdf_path.lower()
+    for doc_type, keywords in _DOC_TYPE_KEYWORDS:
+        if any(term in path_lower for term in keywords):
+            return doc_type
+    return default
+
+
 def import_pdf_to_document_store(pdf_path: str, doc_store: HPEDocumentStore, doc_type: str = "financial") -> str:
     """
     Import a PDF document into the document store.
@@ -30,6 +56,22 @@ def import_pdf_to_document_store(pdf_path: str, doc_store: HPEDocumentStore, doc
     # Process the PDF
     result = process_pdf_document(pdf_path)
     
+    return add_processed_pdf(pdf_path, result, doc_store, doc_type)
+
+
+def add_processed_pdf(pdf_path: str, result: Dict[str, Any], doc_store: HPEDocumentStore, doc_type: str = "financial") -> str:
+    """
+    Add the output of process_pdf_document to the document store.
+    
+    Args:
+        pdf_path: Path to the source PDF file
+        result: Result dictionary from process_pdf_document
+        doc_store: The document store instance
+        doc_type: Type of document (financial, product, press)
+        
+    Returns:
+        Document ID if successful, None otherwise
+    """
     if "error" in result:
         logger.error(f"Error processing PDF: {result['error']}")
         return None
@@ -57,14 +99,19 @@ def import_pdf_to_document_store(pdf_path: str, doc_store: HPEDocumentStore, doc
     return doc_id
 
 
-def batch_import_pdfs(directory: str, doc_store: HPEDocumentStore, doc_type: str = None) -> Dict[str, Any]:
+def batch_import_pdfs(directory: str, doc_store: HPEDocumentStore, doc_type: str = None,
+                      max_workers: Optional[int] = None) -> Dict[str, Any]:
     """
     Import all PDF files from a directory.
     
+    PDF text extraction runs in a process pool; documents are added to the
+    store one at a time on the calling process.
+    
     Args:
         directory: Directory containing PDF files
         doc_store: The document store instance
         doc_type: Type of document (if None, will try to determine)
+        max_workers: Number of extraction processes (defaults to CPU count)
         
     Returns:
         Dictionary with import statistics
@@ -73,8 +120,12 @@ def batch_import_pdfs(directory: str, doc_store: HPEDocumentStore, doc_type: str
         logger.error(f"Directory not found: {directory}")
         return {"error": "Directory not found", "imported": 0, "failed": 0}
     
-    # Find all PDF files in directory
-    pdf_files = glob.glob(os.path.join(directory, "*.pdf"))
+    # Find all PDF files in directory (single scandir pass, any extension case)
+    with os.scandir(directory) as it:
+        pdf_files = sorted(
+            entry.path for entry in it
+            if entry.is_file() and entry.name.lower().endswith('.pdf')
+        )
     
     if not pdf_files:
         logger.warning(f"No PDF files found in {directory}")
@@ -85,33 +136,31 @@ def batch_import_pdfs(directory: str, doc_store: HPEDocumentStore, doc_type: str
     failed = 0
     imported_docs = []
     
-    for pdf_path in pdf_files:
-        # Determine document type if not specified
-        if doc_type is None:
-            path_lower = pdf_path.lower()
-            if any(term in path_lower for term in ['financial', 'earnings', 'revenue', 'quarter', 'fiscal']):
-                detected_type = "financial"
-            elif any(term in path_lower for term in ['product', 'service', 'greenlake', 'offering']):
-                detected_type = "product"
-            elif any(term in path_lower for term in ['press', 'news', 'release', 'announcement']):
-                detected_type = "press"
-            else:
-                detected_type = "financial"  # Default for this script
-        else:
-            detected_type = doc_type
-        
-        # Import the PDF
-        doc_id = import_pdf_to_document_store(pdf_path, doc_store, detected_type)
+    logger.info(f"Extracting text from {len(pdf_files)} PDFs")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Store each PDF as its extraction arrives instead of holding every
+        # extracted text until the whole batch is done
+        pdf_results = executor.map(process_pdf_document, pdf_files)
         
-        if doc_id:
-            imported += 1
-            imported_docs.append({
-                "file": os.path.basename(pdf_path),
-                "id": doc_id,
-                "type": detected_type
-            })
-        else:
-            failed += 1
+        for pdf_path, pdf_result in zip(pdf_files, pdf_results):
+            # Determine document type if not specified
+            if doc_type is None:
+                detected_type = detect_doc_type(pdf_path)  # Defaults to financial for this script
+            else:
+                detected_type = doc_type
+            
+            # Import the PDF
+            doc_id = add_processed_pdf(pdf_path, pdf_result, doc_store, detected_type)
+            
+            if doc_id:
+                imported += 1
+                imported_docs.append({
+                    "file": os.path.basename(pdf_path),
+                    "id": doc_id,
+                    "type": detected_type
+                })
+            else:
+                failed += 1
     
     logger.info(f"Imported {imported} PDFs, {failed} failed")
     
@@ -127,6 +176,8 @@ if __name__ == "__main__":
     parser.add_argument("source", help="PDF file or directory containing PDFs")
     parser.add_argument("--type", choices=["financial", "product", "press"], 
                         help="Document type (if not specified, will try to determine)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of processes for PDF extraction (default: CPU count)")
     
     args = parser.parse_args()
     
@@ -143,7 +194,7 @@ if __name__ == "__main__":
     # Process source (file or directory)
     if os.path.isdir(args.source):
         print(f"\nImporting PDFs from directory: {args.source}")
-        result = batch_import_pdfs(args.source, doc_store, args.type)
+        result = batch_import_pdfs(args.source, doc_store, args.type, args.workers)
         
         print(f"\nImported {result['imported']} PDFs, {result['failed']} failed")
         if result['imported'] > 0:
@@ -166,3 +217,6 @@ if __name__ == "__main__":
     # Print final stats
     print("\nFinal document store statistics:")
     print(json.dumps(doc_store.get_document_stats(), indent=2))
+    
+    # Fold this run's index updates into the snapshot
+    doc_store.close()
@@ -1,36 +1,141 @@
 import os
+import re
 import logging
+import multiprocessing
 import tempfile
-from typing import Dict, Any, Optional, List
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
 import hashlib
+import json
 from datetime import datetime
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("PDFDocHandler")
 
-# Try to import PDF libraries with fallbacks
+# pypdf extraction is split across processes for documents with at least
+# this many pages, PAGE_BATCH_SIZE pages per task
+PARALLEL_PAGE_THRESHOLD = 20
+PAGE_BATCH_SIZE = 10
+
+# Extracted text and PDF metadata are cached here, keyed by file content
+_cache_dir = os.path.expanduser("~/.cache/hpe_pdf/")
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# infer_financial_metadata only scans this many leading characters for indicator
+# terms; cover pages and summaries carry them, the rest of the body rarely adds any
+MAX_SCAN_CHARS = 262144
+
+# Patterns used by infer_financial_metadata, compiled once at import. _Q_RE
+# spells out case with character classes; re.IGNORECASE scans slower.
+_Q_RE = re.compile(r'[Qq]([1-4])\s*(?:[Ff][Yy])?[\s\']?(\d{2,4})')
+
+# Whitespace that Python's \s matches but RE2's does not, e.g. the \xa0 common
+# in extracted PDF text. infer_financial_metadata maps it to ' ' before
+# scanning, so multi-word terms match the same way on either engine.
+_EXTRA_WS_RE = re.compile('[%s]' % ''.join(
+    c for c in map(chr, range(0x3001)) if c.isspace() and c not in ' \t\n\r\f'))
+
+# Boolean indicators searched by infer_financial_metadata, in output order.
+# Patterns are matched against lowercased text, which is much faster than
+# re.IGNORECASE and lets each search use the literal fast path.
+_INDICATOR_PATTERNS = (
+    ("contains_arr", r'annual\s+recurring\s+revenue|arr'),
+    ("contains_greenlake", r'greenlake'),
+    ("contains_intelligent_edge", r'intelligent\s+edge'),
+    ("contains_hpc", r'hpc|high\s+performance\s+computing'),
+)
+
+# Document type indicators, in order of precedence
+_DOCUMENT_TYPE_PATTERNS = (
+    ("earnings", r'earnings\s+call|earnings\s+release|financial\s+results'),
+    ("annual_report", r'annual\s+report'),
+    ("investor_presentation", r'investor\s+presentation'),
+)
+
+_INDICATOR_RES = tuple((name, re.compile(pattern)) for name, pattern in _INDICATOR_PATTERNS)
+_DOCUMENT_TYPE_RES = tuple((name, re.compile(pattern)) for name, pattern in _DOCUMENT_TYPE_PATTERNS)
+
+# With google-re2 installed, all indicators are matched together in a single
+# linear-time pass over the text instead of one search per pattern. An
+# unrelated "re2" module without this API falls back to Python's re.
+_INDICATOR_SET = None
+try:
+    import re2
+    _indicator_set = re2.Set.SearchSet()
+    for _name, _pattern in _INDICATOR_PATTERNS + _DOCUMENT_TYPE_PATTERNS:
+        _indicator_set.Add(_pattern)
+    _indicator_set.Compile()
+    _INDICATOR_SET = _indicator_set
+except (ImportError, AttributeError):
+    pass
+
+# PDF library used for extraction, resolved by _load_pdf_backend on first use.
+# PDF_SUPPORT stays True until the lookup finds no usable library.
 PDF_SUPPORT = True
 PDF_METHOD = None
+_backend_loaded = False
+_backend_lock = threading.Lock()
 
-try:
-    import pypdf
-    PDF_METHOD = "pypdf"
-    logger.info("Using pypdf for PDF extraction")
-except ImportError:
-    try:
-        from pdfminer.high_level import extract_text as pdfminer_extract_text
-        PDF_METHOD = "pdfminer"
-        logger.info("Using pdfminer for PDF extraction")
-    except ImportError:
+fitz = None
+pypdf = None
+pdfminer_extract_text = None
+textract = None
+
+
+def _load_pdf_backend() -> bool:
+    """
+    Import the first available PDF library, once per process.
+    
+    Deferred until a PDF is actually processed so that importing this module
+    (e.g. for infer_financial_metadata) stays cheap. Safe to call from several
+    threads; callers that arrive during the lookup wait for it to finish.
+    
+    Returns:
+        True if a PDF library is available
+    """
+    global PDF_SUPPORT, PDF_METHOD, _backend_loaded
+    global fitz, pypdf, pdfminer_extract_text, textract
+    
+    if _backend_loaded:
+        return PDF_SUPPORT
+    
+    with _backend_lock:
+        if _backend_loaded:
+            return PDF_SUPPORT
+        
         try:
-            import textract
-            PDF_METHOD = "textract"
-            logger.info("Using textract for PDF extraction")
+            try:
+                import pymupdf as fitz
+            except ImportError:
+                import fitz  # PyMuPDF < 1.24
+            PDF_METHOD = "pymupdf"
+            logger.info("Using PyMuPDF for PDF extraction")
         except ImportError:
-            PDF_SUPPORT = False
-            logger.warning("No PDF extraction libraries found. PDF support is disabled.")
-            logger.warning("Install one of: pypdf, pdfminer.six, or textract")
+            try:
+                import pypdf
+                PDF_METHOD = "pypdf"
+                logger.info("Using pypdf for PDF extraction")
+            except ImportError:
+                try:
+                    from pdfminer.high_level import extract_text as pdfminer_extract_text
+                    PDF_METHOD = "pdfminer"
+                    logger.info("Using pdfminer for PDF extraction")
+                except ImportError:
+                    try:
+                        import textract
+                        PDF_METHOD = "textract"
+                        logger.info("Using textract for PDF extraction")
+                    except ImportError:
+                        PDF_SUPPORT = False
+                        logger.warning("No PDF extraction libraries found. PDF support is disabled.")
+                        logger.warning("Install one of: pymupdf, pypdf, pdfminer.six, or textract")
+        
+        # Only publish once the backend globals above are in place
+        _backend_loaded = True
+    
+    return PDF_SUPPORT
 
 
 def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
@@ -43,7 +148,7 @@ def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
     Returns:
         Extracted text or None if extraction failed
     """
-    if not PDF_SUPPORT:
+    if not _load_pdf_backend():
         logger.error("PDF support is not available. Please install a PDF library.")
         return None
     
@@ -52,7 +157,9 @@ def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
         return None
     
     try:
-        if PDF_METHOD == "pypdf":
+        if PDF_METHOD == "pymupdf":
+            return _extract_with_pymupdf(pdf_path)
+        elif PDF_METHOD == "pypdf":
             return _extract_with_pypdf(pdf_path)
         elif PDF_METHOD == "pdfminer":
             return _extract_with_pdfminer(pdf_path)
@@ -66,6 +173,41 @@ def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
         return None
 
 
+def _extract_with_pymupdf(pdf_path: str) -> str:
+    """Extract text using PyMuPDF."""
+    text_parts = []
+    
+    try:
+        with fitz.open(pdf_path) as doc:
+            # Get metadata
+            meta = doc.metadata
+            if meta:
+                text_parts.append("Document Information:")
+                if meta.get('title'):
+                    text_parts.append(f"Title: {meta.get('title')}")
+                if meta.get('subject'):
+                    text_parts.append(f"Subject: {meta.get('subject')}")
+                if meta.get('author'):
+                    text_parts.append(f"Author: {meta.get('author')}")
+                if meta.get('creationDate'):
+                    text_parts.append(f"Creation Date: {meta.get('creationDate')}")
+                text_parts.append("\n")
+            
+            # Extract text from pages
+            for i, page in enumerate(doc):
+                text = page.get_text("text")
+                if text:
+                    text_parts.append(f"Page {i+1}:")
+                    text_parts.append(text)
+                    text_parts.append("\n")
+        
+        return "\n".join(text_parts)
+    
+    except Exception as e:
+        logger.error(f"Error with PyMuPDF extraction: {e}")
+        raise
+
+
 def _extract_with_pypdf(pdf_path: str) -> str:
     """Extract text using pypdf."""
     text_parts = []
@@ -88,13 +230,30 @@ def _extract_with_pypdf(pdf_path: str) -> str:
                     text_parts.append(f"Creation Date: {meta.get('/CreationDate')}")
                 text_parts.append("\n")
             
-            # Extract text from pages
-            for i, page in enumerate(reader.pages):
-                text = page.extract_text()
-                if text:
-                    text_parts.append(f"Page {i+1}:")
-                    text_parts.append(text)
-                    text_parts.append("\n")
+            n_pages = len(reader.pages)
+            
+            # Small documents, single-core machines, and calls already running
+            # in a worker process are extracted in place
+            if (n_pages < PARALLEL_PAGE_THRESHOLD or (os.cpu_count() or 1) < 2
+                    or multiprocessing.parent_process() is not None):
+                page_texts = [page.extract_text() for page in reader.pages]
+            else:
+                page_texts = None
+        
+        # Extract text from pages in parallel; pypdf's parser is pure Python,
+        # so worker processes each reopen the file and handle a batch of pages
+        if page_texts is None:
+            batches = [(pdf_path, start, min(start + PAGE_BATCH_SIZE, n_pages))
+                       for start in range(0, n_pages, PAGE_BATCH_SIZE)]
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                page_texts = [text for batch in executor.map(_extract_pypdf_pages, batches)
+                              for text in batch]
+        
+        for i, text in enumerate(page_texts):
+            if text:
+                text_parts.append(f"Page {i+1}:")
+                text_parts.append(text)
+                text_parts.append("\n")
         
         return "\n".join(text_parts)
     
@@ -103,6 +262,15 @@ def _extract_with_pypdf(pdf_path: str) -> str:
         raise
 
 
+def _extract_pypdf_pages(batch: Tuple[str, int, int]) -> List[str]:
+    """Extract text from pages [start, end) of a PDF using pypdf (runs in a worker process)."""
+    pdf_path, start, end = batch
+    _load_pdf_backend()
+    with open(pdf_path, 'rb') as file:
+        reader = pypdf.PdfReader(file)
+        return [reader.pages[i].extract_text() for i in range(start, end)]
+
+
 def _extract_with_pdfminer(pdf_path: str) -> str:
     """Extract text using pdfminer."""
     try:
@@ -138,11 +306,24 @@ def extract_metadata_from_pdf(pdf_path: str) -> Dict[str, Any]:
         "extraction_date": datetime.now().isoformat()
     }
     
-    if not PDF_SUPPORT:
+    if not _load_pdf_backend():
         return metadata
     
     try:
-        if PDF_METHOD == "pypdf":
+        if PDF_METHOD == "pymupdf":
+            with fitz.open(pdf_path) as doc:
+                # Get document info (PyMuPDF uses empty strings for missing fields)
+                info = doc.metadata or {}
+                for src_key, dest_key in (('title', 'title'), ('author', 'author'),
+                                          ('subject', 'subject'), ('keywords', 'keywords'),
+                                          ('creationDate', 'creation_date')):
+                    if info.get(src_key):
+                        metadata[dest_key] = info[src_key]
+                
+                # Add page count
+                metadata["page_count"] = doc.page_count
+        
+        elif PDF_METHOD == "pypdf":
             with open(pdf_path, 'rb') as file:
                 reader = pypdf.PdfReader(file)
                 
@@ -169,22 +350,23 @@ def extract_metadata_from_pdf(pdf_path: str) -> Dict[str, Any]:
     return metadata
 
 
-def infer_financial_metadata(text: str) -> Dict[str, Any]:
+def infer_financial_metadata(text: str, max_chars: Optional[int] = MAX_SCAN_CHARS) -> Dict[str, Any]:
     """
     Infer financial document metadata from extracted text.
     
     Args:
         text: Extracted text from financial document
+        max_chars: Maximum number of leading characters scanned for indicator
+            and document-type terms (None scans the whole text). The quarter/year
+            lookup always uses the full text.
         
     Returns:
         Dictionary of inferred metadata
     """
-    import re
-    
     metadata = {}
     
     # Look for quarter/year information
-    q_match = re.search(r'Q([1-4])\s*(?:FY)?[\s\']?(\d{2,4})', text, re.IGNORECASE)
+    q_match = _Q_RE.search(text)
     if q_match:
         quarter = q_match.group(1)
         year = q_match.group(2)
@@ -196,41 +378,93 @@ def infer_financial_metadata(text: str) -> Dict[str, Any]:
         metadata["quarter"] = f"Q{quarter}"
         metadata["fiscal_year"] = year
     
-    # Look for financial indicators
-    if re.search(r'annual\s+recurring\s+revenue|arr', text, re.IGNORECASE):
-        metadata["contains_arr"] = True
-    
-    if re.search(r'greenlake', text, re.IGNORECASE):
-        metadata["contains_greenlake"] = True
-    
-    if re.search(r'intelligent\s+edge', text, re.IGNORECASE):
-        metadata["contains_intelligent_edge"] = True
+    # Look for financial indicators (case-folded once for all patterns)
+    head = text[:max_chars] if max_chars is not None else text
+    lowered = _EXTRA_WS_RE.sub(' ', head.lower())
     
-    if re.search(r'hpc|high\s+performance\s+computing', text, re.IGNORECASE):
-        metadata["contains_hpc"] = True
-    
-    # Try to determine document type
-    if re.search(r'earnings\s+call|earnings\s+release|financial\s+results', text, re.IGNORECASE):
-        metadata["document_type"] = "earnings"
-    elif re.search(r'annual\s+report', text, re.IGNORECASE):
-        metadata["document_type"] = "annual_report"
-    elif re.search(r'investor\s+presentation', text, re.IGNORECASE):
-        metadata["document_type"] = "investor_presentation"
+    if _INDICATOR_SET is not None:
+        matched = _INDICATOR_SET.Match(lowered.encode('utf-8')) or ()
+        names = _INDICATOR_PATTERNS + _DOCUMENT_TYPE_PATTERNS
+        found = {names[i][0] for i in matched}
+        
+        for name, _ in _INDICATOR_PATTERNS:
+            if name in found:
+                metadata[name] = True
+        
+        # Try to determine document type
+        for document_type, _ in _DOCUMENT_TYPE_PATTERNS:
+            if document_type in found:
+                metadata["document_type"] = document_type
+                break
+    
+    else:
+        for name, pattern in _INDICATOR_RES:
+            if pattern.search(lowered):
+                metadata[name] = True
+        
+        # Try to determine document type
+        for document_type, pattern in _DOCUMENT_TYPE_RES:
+            if pattern.search(lowered):
+                metadata["document_type"] = document_type
+                break
     
     return metadata
 
 
-def process_pdf_document(pdf_path: str) -> Dict[str, Any]:
+def _pdf_cache_key(pdf_path: str) -> str:
+    """Fingerprint a PDF by streaming its bytes through BLAKE2b."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    return h.hexdigest() + str(os.path.getsize(pdf_path))
+
+
+def _load_cached_extraction(key: str) -> Optional[Dict[str, Any]]:
+    """Return the cached text and metadata for a key, or None on a miss."""
+    cache_path = os.path.join(_cache_dir, key + ".json")
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable PDF cache entry {cache_path}: {e}")
+        return None
+    
+    if not isinstance(cached, dict) or "text" not in cached or "metadata" not in cached:
+        return None
+    return cached
+
+
+def _store_cached_extraction(key: str, text: str, metadata: Dict[str, Any]) -> None:
+    """Atomically write extracted text and metadata to the cache."""
+    try:
+        os.makedirs(_cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=_cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"text": text, "metadata": metadata}, f)
+            os.replace(tmp_path, os.path.join(_cache_dir, key + ".json"))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not write PDF cache entry: {e}")
+
+
+def process_pdf_document(pdf_path: str, use_cache: bool = True) -> Dict[str, Any]:
     """
     Process a PDF document - extract text and metadata.
     
     Args:
         pdf_path: Path to the PDF file
+        use_cache: Reuse the on-disk extraction cache for unchanged files
         
     Returns:
         Dictionary with extracted text and metadata
     """
-    if not PDF_SUPPORT:
+    if not _load_pdf_backend():
         logger.error("PDF support is not available. Please install a PDF library.")
         return {"error": "PDF support not available"}
     
@@ -239,13 +473,26 @@ def process_pdf_document(pdf_path: str) -> Dict[str, Any]:
         return {"error": "File not found"}
     
     try:
-        # Extract text
-        extracted_text = extract_text_from_pdf(pdf_path)
-        if not extracted_text:
-            return {"error": "Text extraction failed"}
+        cache_key = _pdf_cache_key(pdf_path) if use_cache else None
+        cached = _load_cached_extraction(cache_key) if cache_key else None
         
-        # Extract metadata
-        metadata = extract_metadata_from_pdf(pdf_path)
+        if cached:
+            logger.info(f"Using cached extraction for {pdf_path}")
+            extracted_text = cached["text"]
+            metadata = cached["metadata"]
+            # The same content may be cached under a different file name
+            metadata["source_file"] = os.path.basename(pdf_path)
+        else:
+            # Extract text
+            extracted_text = extract_text_from_pdf(pdf_path)
+            if not extracted_text:
+                return {"error": "Text extraction failed"}
+            
+            # Extract metadata
+            metadata = extract_metadata_from_pdf(pdf_path)
+            
+            if cache_key:
+                _store_cached_extraction(cache_key, extracted_text, metadata)
         
         # For financial documents, infer additional metadata
         if "financial" in pdf_path.lower():
@@ -283,8 +530,9 @@ if __name__ == "__main__":
     
     print(f"Processing PDF file: {pdf_path}")
     
-    if not PDF_SUPPORT:
+    if not _load_pdf_backend():
         print("Error: PDF support is not available. Please install one of these libraries:")
+        print("  pip install pymupdf")
         print("  pip install pypdf")
         print("  pip install pdfminer.six")
         print("  pip install textract")
@@ -1,9 +1,86 @@
-import google.generativeai as genai
-from dotenv import load_dotenv
 import os
+import hashlib
+import re
 import time
+import random
+import asyncio
+from collections import OrderedDict
+
+# Shared instructions for single and batched refinement prompts
+_REFINEMENT_GUIDELINES = """
+        You are an expert in refining search queries specifically for HPE (Hewlett Packard Enterprise) business and financial data.
+        Your task is to transform the user's raw query into a more effective search query that will yield better results.
+        
+        Guidelines for refinement:
+        
+        1. Financial terminology standardization:
+           - ARR = Annual Recurring Revenue
+           - GreenLake = HPE's as-a-service platform
+           - HPC = High Performance Computing
+           - EPS = Earnings Per Share
+           - ACM = HPE Aruba Networking, HPE Cray, and HPE Athonet
+        
+        2. Quarter and fiscal year standardization:
+           - Use "Q1 FY24" format for fiscal quarters
+           - Convert written quarters ("third quarter") to "Q3"
+           - Convert written years ("twenty twenty four") to "2024"
+           - HPE's fiscal year ends October 31
+        
+        3. Improve query quality:
+           - Fix typos and grammatical errors
+           - Make abbreviations consistent (HPE, AI, etc.)
+           - Replace vague terms with specific ones
+           - Add contextual keywords if needed
+           - Ensure technical accuracy for HPE-specific terms
+        
+        4. Format:
+           - Maintain brevity while improving precision
+           - Use proper capitalization for product names and business segments
+           - Keep financial metrics clearly identifiable
+        
+"""
+
+# Maximum number of refined queries kept in the in-memory LRU cache
+REFINED_CACHE_SIZE = 2048
+
+# Number of queries sent to the model in one batched prompt
+BATCH_SIZE = 8
+
+# Upper bound in seconds for the backoff between Gemini retries
+MAX_RETRY_DELAY = 30
+
+# google.generativeai and dotenv are imported when a refiner is created, not at
+# module import, so modules that only need the prompt helpers load quickly.
+
+# Matches a numbered line of a batched response, e.g. "3) Refined query"
+_NUMBERED_LINE_RE = re.compile(r'^\s*(\d+)[\).:]\s*(.*\S)\s*$')
+
+
+def _load_non_retriable_errors():
+    """
+    Returns API errors that indicate a bad request or credentials, where
+    retrying is pointless (empty if google.api_core is unavailable).
+    """
+    try:
+        from google.api_core import exceptions as google_exceptions
+    except ImportError:
+        return ()
+    return (
+        google_exceptions.InvalidArgument,
+        google_exceptions.PermissionDenied,
+        google_exceptions.Unauthenticated,
+    )
+
+
+def _retry_delay(retry_count):
+    """Exponential backoff with jitter for the given attempt number, capped."""
+    return min(0.5 * (2 ** retry_count) + random.uniform(0, 0.25), MAX_RETRY_DELAY)
+
 
 class HPEQueryRefiner:
+    # (model, model name) shared by instances, keyed by (API key hash, requested model name)
+    _model_cache = {}
+
     def __init__(self, api_key=None, model_name="gemini-1.5-flash"):
         """
         Initializes the HPE Query Refiner using Gemini API.
@@ -13,6 +90,9 @@ class HPEQueryRefiner:
             api_key (str, optional): Gemini API key. If None, tries to load from environment.
             model_name (str): The Gemini model to use - free tier supports gemini-1.5-flash
         """
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+
         load_dotenv()  # Load environment variables
         
         if api_key is None:
@@ -23,16 +103,75 @@ class HPEQueryRefiner:
         # Configure the Gemini API
         genai.configure(api_key=api_key)
         
-        # Create the model
+        # Create the model, reusing one built earlier for the same key and name
+        cache_key = (hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest(), model_name)
+        cached = HPEQueryRefiner._model_cache.get(cache_key)
+        if cached is None:
+            cached = HPEQueryRefiner._model_cache.setdefault(cache_key, self._create_model(model_name))
+        self.model, self.model_name = cached
+        
+        self._non_retriable_errors = _load_non_retriable_errors()
+        
+        # LRU cache of refined queries keyed by normalized raw query
+        self._refined_cache = OrderedDict()
+
+    @staticmethod
+    def _create_model(model_name):
+        """
+        Creates the Gemini model, falling back to gemini-1.0-pro on failure.
+
+        Args:
+            model_name (str): The Gemini model to use
+
+        Returns:
+            tuple: (model, name of the model actually created)
+        """
+        import google.generativeai as genai
+
         try:
-            self.model = genai.GenerativeModel(model_name=model_name)
-            self.model_name = model_name
+            model = genai.GenerativeModel(model_name=model_name)
             print(f"Successfully initialized model: {model_name}")
+            return model, model_name
         except Exception as e:
             print(f"Error initializing model {model_name}: {e}")
             print("Falling back to gemini-1.0-pro model...")
-            self.model = genai.GenerativeModel("gemini-1.0-pro")
-            self.model_name = "gemini-1.0-pro"
+            return genai.GenerativeModel("gemini-1.0-pro"), "gemini-1.0-pro"
+
+    @staticmethod
+    def _cache_key(user_query):
+        """Normalizes a raw query for cache lookups (case and whitespace)."""
+        return " ".join(user_query.lower().split())
+
+    def _get_cached(self, user_query):
+        """Returns the cached refinement for a query, or None."""
+        key = self._cache_key(user_query)
+        refined_query = self._refined_cache.get(key)
+        if refined_query is not None:
+            self._refined_cache.move_to_end(key)
+        return refined_query
+
+    def _store_cached(self, user_query, refined_query):
+        """Caches a successful refinement, evicting the least recently used."""
+        key = self._cache_key(user_query)
+        self._refined_cache[key] = refined_query
+        self._refined_cache.move_to_end(key)
+        if len(self._refined_cache) > REFINED_CACHE_SIZE:
+            self._refined_cache.popitem(last=False)
+
+    def _build_prompt(self, user_query):
+        """
+        Builds the refinement prompt for a single query.
+
+        Args:
+            user_query (str): The original query from the user
+
+        Returns:
+            str: The prompt sent to the model
+        """
+        return f"""{_REFINEMENT_GUIDELINES}        Original Query: "{user_query}"
+        
+        Refined Query (ONLY provide the refined query, no explanations):
+        """
 
     def refine_query(self, user_query):
         """
@@ -44,41 +183,11 @@ class HPEQueryRefiner:
         Returns:
             str: The refined query
         """
-        prompt = f"""
-        You are an expert in refining search queries specifically for HPE (Hewlett Packard Enterprise) business and financial data.
-        Your task is to transform the user's raw query into a more effective search query that will yield better results.
-        
-        Guidelines for refinement:
-        
-        1. Financial terminology standardization:
-           - ARR = Annual Recurring Revenue
-           - GreenLake = HPE's as-a-service platform
-           - HPC = High Performance Computing
-           - EPS = Earnings Per Share
-           - ACM = HPE Aruba Networking, HPE Cray, and HPE Athonet
-        
-        2. Quarter and fiscal year standardization:
-           - Use "Q1 FY24" format for fiscal quarters
-           - Convert written quarters ("third quarter") to "Q3"
-           - Convert written years ("twenty twenty four") to "2024"
-           - HPE's fiscal year ends October 31
+        cached = self._get_cached(user_query)
+        if cached is not None:
+            return cached
         
-        3. Improve query quality:
-           - Fix typos and grammatical errors
-           - Make abbreviations consistent (HPE, AI, etc.)
-           - Replace vague terms with specific ones
-           - Add contextual keywords if needed
-           - Ensure technical accuracy for HPE-specific terms
-        
-        4. Format:
-           - Maintain brevity while improving precision
-           - Use proper capitalization for product names and business segments
-           - Keep financial metrics clearly identifiable
-        
-        Original Query: "{user_query}"
-        
-        Refined Query (ONLY provide the refined query, no explanations):
-        """
+        prompt = self._build_prompt(user_query)
 
         try:
             retry_count = 0
@@ -99,21 +208,188 @@ class HPEQueryRefiner:
                     refined_query = response.text.strip()
                     # Remove any quotes if they were added by the model
                     refined_query = refined_query.strip('"\'')
+                    self._store_cached(user_query, refined_query)
                     return refined_query
                 
+                except self._non_retriable_errors as e:
+                    # Bad requests and auth failures won't succeed on retry
+                    print(f"Non-retriable error during query refinement: {e}")
+                    return user_query
+                
                 except Exception as e:
                     retry_count += 1
                     if retry_count >= max_retries:
                         print(f"Error after {max_retries} attempts: {e}")
                         return user_query
                     
-                    print(f"Attempt {retry_count} failed: {e}. Retrying in 2 seconds...")
-                    time.sleep(2)
+                    delay = _retry_delay(retry_count)
+                    print(f"Attempt {retry_count} failed: {e}. Retrying in {delay:.1f} seconds...")
+                    time.sleep(delay)
         
         except Exception as e:
             print(f"Error during query refinement: {e}")
             return user_query  # Return original query in case of error
 
+    def _build_batch_prompt(self, queries):
+        """
+        Builds a single prompt asking for one refined query per numbered line.
+
+        Args:
+            queries (list): The original queries, numbered from 1 in the prompt
+
+        Returns:
+            str: The batched prompt
+        """
+        numbered = "\n".join(f'        {idx}) "{query}"' for idx, query in enumerate(queries, 1))
+        return f"""{_REFINEMENT_GUIDELINES}        Refine each of the following queries.
+        Output one refined query per line, prefixed by its number and ")" (for example: 1) ...).
+        Do not add explanations or any other lines.
+
+        Original Queries:
+{numbered}
+
+        Refined Queries:
+        """
+
+    def _parse_batch_response(self, text, count):
+        """
+        Parses a numbered batched response.
+
+        Args:
+            text (str): The model response
+            count (int): Number of queries in the batch
+
+        Returns:
+            dict: Maps 0-based query index to its refined query
+        """
+        refined = {}
+        for line in text.splitlines():
+            match = _NUMBERED_LINE_RE.match(line)
+            if not match:
+                continue
+            idx = int(match.group(1)) - 1
+            value = match.group(2).strip().strip('"\'')
+            if 0 <= idx < count and value and idx not in refined:
+                refined[idx] = value
+        return refined
+
+    def refine_queries(self, queries, batch_size=BATCH_SIZE):
+        """
+        Refines several HPE-related queries with one Gemini call per batch.
+
+        Cached queries are answered without an API call, and queries missing
+        from a batched response are refined individually with refine_query.
+        If the batch call itself fails, its queries are returned unchanged.
+
+        Args:
+            queries (list): The original queries from the user
+            batch_size (int): Number of queries sent per API call
+
+        Returns:
+            list: The refined queries, in the same order as the input
+        """
+        results = [self._get_cached(query) for query in queries]
+
+        # Only send queries that are not cached, each normalized form once
+        pending = {}
+        for idx, query in enumerate(queries):
+            if results[idx] is None:
+                pending.setdefault(self._cache_key(query), []).append(idx)
+        pending_queries = [queries[indices[0]] for indices in pending.values()]
+
+        for start in range(0, len(pending_queries), batch_size):
+            batch = pending_queries[start:start + batch_size]
+            prompt = self._build_batch_prompt(batch)
+            refined = {}
+            batch_failed = False
+
+            retry_count = 0
+            max_retries = 3
+
+            while retry_count < max_retries:
+                try:
+                    response = self.model.generate_content(
+                        prompt,
+                        generation_config={
+                            "temperature": 0.1,
+                            "max_output_tokens": 100 * len(batch),
+                            "top_p": 0.95,
+                        }
+                    )
+                    refined = self._parse_batch_response(response.text, len(batch))
+                    break
+
+                except self._non_retriable_errors as e:
+                    # Bad requests and auth failures won't succeed on retry
+                    print(f"Non-retriable error during batch refinement: {e}")
+                    batch_failed = True
+                    break
+
+                except Exception as e:
+                    retry_count += 1
+                    if retry_count >= max_retries:
+                        print(f"Error after {max_retries} attempts: {e}")
+                        batch_failed = True
+                        break
+
+                    delay = _retry_delay(retry_count)
+                    print(f"Attempt {retry_count} failed: {e}. Retrying in {delay:.1f} seconds...")
+                    time.sleep(delay)
+
+            for idx, query in enumerate(batch):
+                if idx in refined:
+                    refined_query = refined[idx]
+                    self._store_cached(query, refined_query)
+                elif batch_failed:
+                    # Retrying each query alone would repeat the failed calls
+                    refined_query = query  # Return original query in case of error
+                else:
+                    refined_query = self.refine_query(query)
+                for result_idx in pending[self._cache_key(query)]:
+                    results[result_idx] = refined_query
+
+        return results
+
+    async def refine_queries_async(self, queries):
+        """
+        Refines several HPE-related queries with concurrent Gemini calls.
+
+        Sends one request per query instead of batching them into a prompt.
+
+        Args:
+            queries (list): The original queries from the user
+
+        Returns:
+            list: The refined queries, in the same order as the input
+        """
+        results = [self._get_cached(query) for query in queries]
+        pending = [idx for idx, refined_query in enumerate(results) if refined_query is None]
+
+        responses = await asyncio.gather(
+            *(self.model.generate_content_async(
+                self._build_prompt(queries[idx]),
+                generation_config={
+                    "temperature": 0.1,
+                    "max_output_tokens": 100,
+                    "top_p": 0.95,
+                }
+            ) for idx in pending),
+            return_exceptions=True
+        )
+
+        for idx, response in zip(pending, responses):
+            query = queries[idx]
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                refined_query = response.text.strip().strip('"\'')
+                self._store_cached(query, refined_query)
+                results[idx] = refined_query
+            except Exception as e:
+                print(f"Error refining query '{query}': {e}")
+                results[idx] = query  # Return original query in case of error
+        return results
+
 
 # --- Example Usage ---
 if __name__ == "__main__":
@@ -137,15 +413,14 @@ if __name__ == "__main__":
     print(f"QUERY REFINEMENT USING {refiner.model_name.upper()}")
     print("="*80 + "\n")
 
-    for idx, query in enumerate(test_queries, 1):
+    # Refine all queries with batched API calls
+    start_time = time.time()
+    refined_queries = refiner.refine_queries(test_queries)
+    end_time = time.time()
+
+    for idx, (query, refined_query) in enumerate(zip(test_queries, refined_queries), 1):
         print(f"\n{idx}. ORIGINAL: {query}")
-        try:
-            start_time = time.time()
-            refined_query = refiner.refine_query(query)
-            end_time = time.time()
-            
-            print(f"   REFINED : {refined_query}")
-            print(f"   TIME    : {(end_time - start_time):.2f} seconds")
-        except Exception as e:
-            print(f"   ERROR   : {e}")
-        print("-" * 80)
\ No newline at end of file
+        print(f"   REFINED : {refined_query}")
+        print("-" * 80)
+
+    print(f"\nTOTAL TIME: {(end_time - start_time):.2f} seconds for {len(test_queries)} queries")
@@ -0,0 +1,43 @@
+import threading
+import time
+
+# Default model calls per second allowed by the test harnesses
+DEFAULT_RPS = 1.0
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter shared across threads.
+
+    Tokens refill continuously at `rps` per second up to `burst`. A call only
+    waits when the bucket is empty, so calls that are already spaced out by
+    their own latency never sleep.
+    """
+
+    def __init__(self, rps: float = DEFAULT_RPS, burst: float = None):
+        """
+        Initialize the bucket (full).
+
+        Args:
+            rps: Sustained calls per second
+            burst: Maximum calls allowed back to back (defaults to max(1, rps))
+        """
+        if rps <= 0:
+            raise ValueError("rps must be positive")
+        self.rps = rps
+        self.capacity = burst if burst is not None else max(1.0, rps)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rps)
+            self._last = now
+            # Reserve the token now; a negative balance queues later callers
+            self._tokens -= 1
+            wait = -self._tokens / self.rps if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
@@ -1,13 +1,110 @@
 import os
+import re
 import argparse
 import json
 import sys
 import time
-import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple
 
-from src.hpe_document_store import HPEDocumentStore
+from src.hpe_document_store import HPEDocumentStore, hash_content
+
+# Patterns used by extract_metadata, compiled once at import
+# Case handled with explicit classes rather than re.IGNORECASE, which scans slower
+_QUARTER_RE = re.compile(r'[Qq]([1-4])\s+[Ff][Yy]?(\d{2,4})')
+_DATE_RE = re.compile(r'(\w+ \d{1,2},? \d{4})')
+
+# File types picked up by the scanner, and the largest file it will import
+DOCUMENT_EXTENSIONS = frozenset({'.txt', '.md', '.csv', '.json'})
+MAX_DOCUMENT_SIZE = 10 * 1024 * 1024
+
+# Below this many files the import runs serially instead of starting workers
+PARALLEL_FILE_THRESHOLD = 16
+
+# Keywords used to guess a document type from its path or content
+_PATH_FINANCIAL_TERMS = ('financial', 'earnings', 'revenue', 'quarter', 'fiscal')
+_PATH_PRODUCT_TERMS = ('product', 'service', 'greenlake', 'offering')
+_PATH_PRESS_TERMS = ('press', 'news', 'release', 'announcement')
+_CONTENT_FINANCIAL_TERMS = ('revenue', 'quarterly results', 'fiscal', 'earnings', 'eps', 'arr')
+_CONTENT_PRODUCT_TERMS = ('product', 'service', 'greenlake', 'platform', 'solution')
+_CONTENT_PRESS_TERMS = ('announces', 'today announced', 'press release')
+
+# Bytes read from the start of a file for type detection / metadata
+_TYPE_HEADER_CHARS = 4096
+_METADATA_HEADER_CHARS = 8192
+
+def _document_info(entry: os.DirEntry) -> Optional[Dict[str, Any]]:
+    """
+    Build the info dictionary for a directory entry if it is a document.
+    
+    Args:
+        entry: Entry returned by os.scandir
+        
+    Returns:
+        Document info dictionary, or None if the entry should be skipped
+    """
+    # Skip directories and non-text files
+    if entry.is_dir():
+        return None
+    
+    if os.path.splitext(entry.name)[1].lower() not in DOCUMENT_EXTENSIONS:
+        return None
+    
+    # Get file stats
+    try:
+        file_stats = entry.stat()
+    except OSError as e:
+        print(f"Error getting file info for {entry.path}: {e}")
+        return None
+    file_size = file_stats.st_size
+    
+    # Only process reasonable sized files (up to 10MB)
+    if file_size > MAX_DOCUMENT_SIZE:
+        print(f"Skipping large file: {entry.path} ({file_size / 1024 / 1024:.2f} MB)")
+        return None
+    
+    # Basic file info
+    return {
+        "path": entry.path,
+        "filename": entry.name,
+        "size": file_size,
+        "last_modified": datetime.fromtimestamp(file_stats.st_mtime).isoformat()
+    }
+
+def scan_directory_recursive(directory: str) -> List[Dict[str, Any]]:
+    """
+    Scan a directory tree for document files.
+    
+    Args:
+        directory: Root directory to scan
+        
+    Returns:
+        List of document info dictionaries
+    """
+    if not os.path.isdir(directory):
+        print(f"Directory not found: {directory}")
+        return []
+    
+    documents = []
+    stack = [directory]
+    
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                        continue
+                    doc_info = _document_info(entry)
+                    if doc_info:
+                        documents.append(doc_info)
+        except OSError as e:
+            print(f"Error scanning directory {current}: {e}")
+    
+    return documents
 
 def scan_directory_for_documents(directory: str) -> List[Dict[str, Any]]:
     """
@@ -19,42 +116,111 @@ def scan_directory_for_documents(directory: str) -> List[Dict[str, Any]]:
     Returns:
         List of document info dictionaries
     """
-    if not os.path.exists(directory) or not os.path.isdir(directory):
+    if not os.path.isdir(directory):
         print(f"Directory not found: {directory}")
         return []
     
     documents = []
     
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
+    with os.scandir(directory) as it:
+        for entry in it:
+            doc_info = _document_info(entry)
+            if doc_info:
+                documents.append(doc_info)
+    
+    return documents
+
+def _read_header(file_path: str, size: int = 8192) -> str:
+    """
+    Read the start of a file as text with a single os.read call.
+    
+    Avoids the buffered text IO stack for the small header reads done per
+    scanned file. Newlines are normalized as text mode would.
+    
+    Args:
+        file_path: Path to the file
+        size: Number of bytes to read
         
-        # Skip directories and non-text files
-        if os.path.isdir(file_path):
-            continue
+    Returns:
+        Decoded header text
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        raw = os.read(fd, size)
+    finally:
+        os.close(fd)
+    
+    text = raw.decode('utf-8', errors='ignore')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def _doc_type_from_path(file_path: str) -> Optional[str]:
+    """Guess a document type from keywords in the file path."""
+    path_lower = file_path.lower()
+    
+    if any(term in path_lower for term in _PATH_FINANCIAL_TERMS):
+        return "financial"
+    elif any(term in path_lower for term in _PATH_PRODUCT_TERMS):
+        return "product"
+    elif any(term in path_lower for term in _PATH_PRESS_TERMS):
+        return "press"
+    return None
+
+def _doc_type_from_content(content_lower: str) -> str:
+    """Guess a document type from keywords in lowercased content."""
+    # Check for financial indicators
+    if any(term in content_lower for term in _CONTENT_FINANCIAL_TERMS):
+        return "financial"
+    
+    # Check for product indicators
+    if any(term in content_lower for term in _CONTENT_PRODUCT_TERMS):
+        return "product"
+    
+    # Check for press release indicators
+    if any(term in content_lower for term in _CONTENT_PRESS_TERMS):
+        return "press"
+    
+    # Default to "other" if type couldn't be determined
+    return "other"
+
+def _metadata_from_content(content: str, content_lower: str, doc_type: str) -> Dict[str, Any]:
+    """Extract metadata from a document header and its lowercased copy."""
+    metadata = {}
+    
+    # Extract quarter and year for financial documents
+    if doc_type == "financial":
+        # Look for quarter references like Q1, Q2, etc.
+        quarter_match = _QUARTER_RE.search(content)
+        if quarter_match:
+            metadata["quarter"] = f"Q{quarter_match.group(1)}"
+            year = quarter_match.group(2)
+            if len(year) == 2:
+                year = f"20{year}"
+            metadata["fiscal_year"] = year
         
-        if not filename.endswith(('.txt', '.md', '.csv', '.json')):
-            continue
-            
-        # Get file stats
-        file_stats = os.stat(file_path)
-        file_size = file_stats.st_size
+        # Look for ARR mentions
+        if 'annual recurring revenue' in content_lower or 'arr' in content_lower:
+            metadata["includes_arr"] = True
         
-        # Only process reasonable sized files (up to 10MB)
-        if file_size > 10 * 1024 * 1024:
-            print(f"Skipping large file: {file_path} ({file_size / 1024 / 1024:.2f} MB)")
-            continue
-            
-        # Basic file info
-        doc_info = {
-            "path": file_path,
-            "filename": filename,
-            "size": file_size,
-            "last_modified": datetime.fromtimestamp(file_stats.st_mtime).isoformat()
-        }
+    # Extract product name for product documents
+    elif doc_type == "product":
+        # Look for GreenLake mentions
+        if 'greenlake' in content_lower:
+            metadata["product"] = "GreenLake"
         
-        documents.append(doc_info)
+        # Look for Aruba mentions
+        if 'aruba' in content_lower:
+            metadata["product"] = "Aruba"
+        
+    # Extract announcement date for press releases
+    elif doc_type == "press":
+        # Try to find a date pattern
+        date_match = _DATE_RE.search(content)
+        if date_match:
+            metadata["publication_date"] = date_match.group(1)
     
-    return documents
+    return metadata
 
 def determine_doc_type(file_path: str) -> str:
     """
@@ -67,36 +233,18 @@ def determine_doc_type(file_path: str) -> str:
         Document type string
     """
     # Try to determine type from path
-    path_lower = file_path.lower()
-    
-    if any(term in path_lower for term in ['financial', 'earnings', 'revenue', 'quarter', 'fiscal']):
-        return "financial"
-    elif any(term in path_lower for term in ['product', 'service', 'greenlake', 'offering']):
-        return "product"
-    elif any(term in path_lower for term in ['press', 'news', 'release', 'announcement']):
-        return "press"
+    doc_type = _doc_type_from_path(file_path)
+    if doc_type:
+        return doc_type
     
     # Try to read content to determine type
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read(4096)  # Read first 4KB
-            
-            # Check for financial indicators
-            if any(term in content.lower() for term in ['revenue', 'quarterly results', 'fiscal', 'earnings', 'eps', 'arr']):
-                return "financial"
-            
-            # Check for product indicators
-            if any(term in content.lower() for term in ['product', 'service', 'greenlake', 'platform', 'solution']):
-                return "product"
-            
-            # Check for press release indicators
-            if any(term in content.lower() for term in ['announces', 'today announced', 'press release']):
-                return "press"
+        content = _read_header(file_path, _TYPE_HEADER_CHARS)  # Read first 4KB
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
+        return "other"
     
-    # Default to "other" if type couldn't be determined
-    return "other"
+    return _doc_type_from_content(content.lower())
 
 def extract_metadata(file_path: str, doc_type: str) -> Dict[str, Any]:
     """
@@ -109,116 +257,193 @@ def extract_metadata(file_path: str, doc_type: str) -> Dict[str, Any]:
     Returns:
         Metadata dictionary
     """
-    metadata = {}
+    try:
+        content = _read_header(file_path, _METADATA_HEADER_CHARS)  # Read first 8KB
+    except Exception as e:
+        print(f"Error extracting metadata from {file_path}: {e}")
+        return {}
+    
+    return _metadata_from_content(content, content.lower(), doc_type)
+
+def classify_and_extract(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Determine the document type and extract metadata with a single read.
+    
+    Equivalent to determine_doc_type followed by extract_metadata, but the
+    file header is opened, read and lowercased only once.
+    
+    Args:
+        file_path: Path to the document file
+        
+    Returns:
+        Tuple of (document type, metadata dictionary)
+    """
+    try:
+        content = _read_header(file_path, _METADATA_HEADER_CHARS)
+    except Exception as e:
+        print(f"Error reading file {file_path}: {e}")
+        return _doc_type_from_path(file_path) or "other", {}
+    
+    return _classify_header(file_path, content)
+
+def _classify_header(file_path: str, content: str) -> Tuple[str, Dict[str, Any]]:
+    """Determine type and metadata from the first 8KB of a document."""
+    content = content[:_METADATA_HEADER_CHARS]
+    content_lower = content.lower()
+    doc_type = (_doc_type_from_path(file_path)
+                or _doc_type_from_content(content_lower[:_TYPE_HEADER_CHARS]))
+    return doc_type, _metadata_from_content(content, content_lower, doc_type)
+
+def _classify(file_info: Dict[str, Any], load_content: bool = True) -> Tuple[Optional[str], Optional[str], str, Dict[str, Any]]:
+    """
+    Read and classify one file without touching the document store.
+    
+    Runs in worker processes, so it only does file IO, hashing and keyword
+    matching.
+    
+    Args:
+        file_info: File info dictionary from the scan
+        load_content: If True, read the whole file and return its content
+            along with its hash_content digest
+        
+    Returns:
+        Tuple of (content or None, content hash or None, document type,
+        metadata dictionary)
+    """
+    file_path = file_info["path"]
+    
+    if not load_content:
+        doc_type, metadata = classify_and_extract(file_path)
+        return None, None, doc_type, metadata
     
     try:
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read(8192)  # Read first 8KB
-            
-            # Extract quarter and year for financial documents
-            if doc_type == "financial":
-                # Look for quarter references like Q1, Q2, etc.
-                quarter_match = re.search(r'Q([1-4])\s+FY?(\d{2,4})', content, re.IGNORECASE)
-                if quarter_match:
-                    metadata["quarter"] = f"Q{quarter_match.group(1)}"
-                    year = quarter_match.group(2)
-                    if len(year) == 2:
-                        year = f"20{year}"
-                    metadata["fiscal_year"] = year
-                
-                # Look for ARR mentions
-                if 'annual recurring revenue' in content.lower() or 'arr' in content.lower():
-                    metadata["includes_arr"] = True
-                
-            # Extract product name for product documents
-            elif doc_type == "product":
-                # Look for GreenLake mentions
-                if 'greenlake' in content.lower():
-                    metadata["product"] = "GreenLake"
-                
-                # Look for Aruba mentions
-                if 'aruba' in content.lower():
-                    metadata["product"] = "Aruba"
-                
-            # Extract announcement date for press releases
-            elif doc_type == "press":
-                # Try to find a date pattern
-                date_match = re.search(r'(\w+ \d{1,2},? \d{4})', content)
-                if date_match:
-                    metadata["publication_date"] = date_match.group(1)
-    
+            content = f.read()
     except Exception as e:
-        print(f"Error extracting metadata from {file_path}: {e}")
+        print(f"Error reading file {file_path}: {e}")
+        return None, None, _doc_type_from_path(file_path) or "other", {}
     
-    return metadata
+    doc_type, metadata = _classify_header(file_path, content)
+    return content, hash_content(content), doc_type, metadata
+
+def _commit(doc_store: HPEDocumentStore, file_info: Dict[str, Any],
+            content: Optional[str], doc_type: str, metadata: Dict[str, Any],
+            lines: List[str], dry_run: bool = False) -> bool:
+    """
+    Add a classified file to the document store.
+    
+    Report lines for the file are appended to `lines` so the caller can
+    write them in one call.
+    
+    Returns:
+        True if the document was imported
+    """
+    file_path = file_info["path"]
+    
+    # Add filename to metadata
+    metadata["source_filename"] = file_info["filename"]
+    metadata["last_modified"] = file_info["last_modified"]
+    
+    lines.append(f"Found document: {file_path}")
+    lines.append(f"  Type: {doc_type}")
+    lines.append(f"  Metadata: {metadata}")
+    
+    if dry_run:
+        lines.append("  [DRY RUN] Would import this document")
+        return False
+    
+    if content is None:
+        lines.append(f"  Error importing: could not read {file_path}")
+        return False
+    
+    try:
+        doc_id = doc_store.add_document(
+            content=content,
+            doc_type=doc_type,
+            metadata=metadata
+        )
+        
+        if doc_id:
+            lines.append(f"  Imported as: {doc_id}")
+            return True
+        lines.append(f"  Failed to import")
+    except Exception as e:
+        lines.append(f"  Error importing: {e}")
+    return False
 
 def import_files_to_store(doc_store: HPEDocumentStore, 
                          files: List[Dict[str, Any]], 
-                         dry_run: bool = False) -> int:
+                         dry_run: bool = False,
+                         max_workers: Optional[int] = None,
+                         verbose: bool = True) -> int:
     """
     Import found files into the document store.
     
+    Files are read and classified in worker processes; documents are added
+    to the store one at a time on the calling thread.
+    
     Args:
         doc_store: Document store instance
         files: List of file info dictionaries
         dry_run: If True, don't actually import files
+        max_workers: Number of worker processes (defaults to CPU count, 1 disables)
+        verbose: If True, report every file; otherwise show a progress counter
+            and only report files that failed to import
         
     Returns:
         Number of files imported
     """
     imported_count = 0
+    classify = partial(_classify, load_content=not dry_run)
+    write = sys.stdout.write
+    total = len(files)
     
-    for file_info in files:
-        file_path = file_info["path"]
-        
-        # Determine document type
-        doc_type = determine_doc_type(file_path)
-        
-        # Extract metadata
-        metadata = extract_metadata(file_path, doc_type)
-        
-        # Add filename to metadata
-        metadata["source_filename"] = file_info["filename"]
-        metadata["last_modified"] = file_info["last_modified"]
-        
-        print(f"Found document: {file_path}")
-        print(f"  Type: {doc_type}")
-        print(f"  Metadata: {metadata}")
-        
-        if not dry_run:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                
-                doc_id = doc_store.add_document(
-                    content=content,
-                    doc_type=doc_type,
-                    metadata=metadata
-                )
-                
-                if doc_id:
+    if max_workers == 1 or len(files) < PARALLEL_FILE_THRESHOLD:
+        results = map(classify, files)
+        executor = None
+    else:
+        # Classification is independent per file; the store is updated serially below
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        results = executor.map(classify, files, chunksize=8)
+    
+    try:
+        for processed, (file_info, (content, content_hash, doc_type, metadata)) in enumerate(zip(files, results), 1):
+            lines = []
+            
+            # Skip files whose text is already stored, including earlier files in this run
+            existing_id = doc_store.find_by_content_hash(content_hash) if content_hash else None
+            if existing_id is not None:
+                imported = False
+                lines.append(f"Skipping {file_info['path']}: identical content is already stored as {existing_id}")
+            else:
+                imported = _commit(doc_store, file_info, content, doc_type, metadata, lines, dry_run)
+                if imported:
                     imported_count += 1
-                    print(f"  Imported as: {doc_id}")
-                else:
-                    print(f"  Failed to import")
-            except Exception as e:
-                print(f"  Error importing: {e}")
-        else:
-            print("  [DRY RUN] Would import this document")
+            
+            if verbose:
+                write("\n".join(lines) + "\n")
+            else:
+                if not imported and not dry_run and existing_id is None:
+                    # Keep failures visible; start on a fresh line after the counter
+                    write("\r" + "\n".join(lines) + "\n")
+                write(f"\rProcessed {processed}/{total} documents")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    if not verbose and total:
+        write("\n")
     
     return imported_count
 
 
-# Add support for importing documents from this module
-import re  # Add this import at the top of the file
-
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Scan and import documents into HPE Document Store")
     parser.add_argument("directories", nargs="*", default=["hpe_docs"], help="Directories to scan for documents")
     parser.add_argument("--dry-run", action="store_true", help="Don't actually import documents")
     parser.add_argument("--recursive", action="store_true", help="Scan directories recursively")
     parser.add_argument("--verbose", action="store_true", help="Show verbose output")
+    parser.add_argument("--threads", type=int, default=None, help="Number of worker processes used to classify files")
     
     args = parser.parse_args()
     
@@ -237,38 +462,20 @@ if __name__ == "__main__":
     for directory in args.directories:
         if args.recursive:
             # Walk directory recursively
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    
-                    # Basic file info
-                    try:
-                        file_stats = os.stat(file_path)
-                        all_files.append({
-                            "path": file_path,
-                            "filename": file,
-                            "size": file_stats.st_size,
-                            "last_modified": datetime.fromtimestamp(file_stats.st_mtime).isoformat()
-                        })
-                    except Exception as e:
-                        print(f"Error getting file info for {file_path}: {e}")
+            all_files.extend(scan_directory_recursive(directory))
         else:
             # Just scan top level
             files = scan_directory_for_documents(directory)
             all_files.extend(files)
     
-    print(f"\nFound {len(all_files)} potential documents")
-    
-    # Filter out files that likely aren't documents
-    valid_files = [f for f in all_files if f["path"].endswith(('.txt', '.md', '.csv', '.json'))]
-    
-    print(f"After filtering, {len(valid_files)} documents will be processed")
+    # The scanners already skip files that likely aren't documents
+    print(f"\nFound {len(all_files)} documents to process")
     
     # Import files
     if args.dry_run:
         print("\nDRY RUN MODE - No documents will actually be imported")
     
-    imported_count = import_files_to_store(doc_store, valid_files, args.dry_run)
+    imported_count = import_files_to_store(doc_store, all_files, args.dry_run, args.threads, args.verbose)
     
     # Print final stats
     if not args.dry_run:
@@ -278,4 +485,7 @@ if __name__ == "__main__":
     else:
         print(f"\nWould have imported {imported_count} documents")
     
+    # Fold this run's index updates into the snapshot
+    doc_store.close()
+    
     print("\nScan completed")
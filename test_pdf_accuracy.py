@@ -1,48 +1,149 @@
-import os
+import io
 import json
+import os
 import argparse
 import logging
-from typing import List, Dict, Any, Tuple
+from dataclasses import asdict, dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from hpe_document_store import HPEDocumentStore
 from hpe_rag_query_refiner import HPERAGQueryRefiner
+from rate_limiter import TokenBucket, DEFAULT_RPS
+
+# orjson serializes the results sidecar much faster than stdlib json; fall back if missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("PDFAccuracyTest")
 
+# Test queries refined concurrently by default; model calls are still rate limited
+DEFAULT_WORKERS = 4
+
+# Queries generated for each document whose metadata sets the flag
+# (flags come from pdf_document_handler.infer_financial_metadata)
+_SEGMENT_QUERIES = (
+    ("contains_greenlake", "How is HPE's GreenLake business performing?",
+     ("GreenLake", "as-a-service", "growth")),
+    ("contains_intelligent_edge", "What is the revenue for HPE's Intelligent Edge segment?",
+     ("Intelligent Edge", "revenue", "growth")),
+    ("contains_hpc", "How is HPE's HPC & AI business segment performing?",
+     ("HPC", "AI", "revenue")),
+    ("contains_arr", "What is HPE's ARR?",
+     ("ARR", "recurring", "revenue")),
+)
+
+@dataclass(slots=True)
+class AccuracyResult:
+    """Outcome of one accuracy test query."""
+    original_query: str
+    expected_terms: List[str]
+    matched_terms: List[str] = field(default_factory=list)
+    accuracy: float = 0.0
+    processing_time: float = 0.0
+    document_ids: List[str] = field(default_factory=list)
+    refined_query: Optional[str] = None
+    error: Optional[str] = None
+
+def match_expected_terms(refined_query: str, expected_terms: List[str],
+                         expected_terms_lc: Optional[List[str]] = None) -> List[str]:
+    """
+    Return the expected terms that appear in a refined query (case-insensitive).
+    
+    The query is lowercased once; with only a handful of terms per test,
+    plain substring checks beat building an alternation regex per query.
+    Pass expected_terms_lc (the terms already lowercased) to skip lowering
+    them again.
+    """
+    refined_lower = refined_query.lower()
+    if expected_terms_lc is None:
+        expected_terms_lc = [term.lower() for term in expected_terms]
+    return [term for term, term_lc in zip(expected_terms, expected_terms_lc) if term_lc in refined_lower]
+
+def _dumps(results: List[AccuracyResult]) -> bytes:
+    """Serialize accuracy results as indented JSON."""
+    if orjson is not None:
+        return orjson.dumps(results, option=orjson.OPT_INDENT_2)
+    return json.dumps([asdict(r) for r in results], indent=2).encode('utf-8')
+
 class PDFAccuracyTester:
     """
     Tests the accuracy of information extracted from PDF documents
     by running specific queries that target known information in the documents.
     """
     
-    def __init__(self):
-        """Initialize the accuracy tester."""
+    def __init__(self, rps: float = DEFAULT_RPS):
+        """
+        Initialize the accuracy tester.
+        
+        Args:
+            rps: Maximum model calls per second
+        """
         self.doc_store = HPEDocumentStore()
         self.refiner = HPERAGQueryRefiner(doc_store=self.doc_store)
         
+        # Model calls only wait when the request budget is used up
+        self.rate_limiter = TokenBucket(rps)
+        
+        # Store reads memoized per document store version: version -> result
+        self._stats_cache: Dict[int, Dict[str, Any]] = {}
+        self._financial_docs_cache: Dict[int, List[Dict[str, Any]]] = {}
+        
         # Get document stats
-        self.stats = self.doc_store.get_document_stats()
+        self.stats = self._document_stats()
         logger.info(f"Document store has {self.stats['total_documents']} documents")
         
         # Check for financial documents
         if self.stats["by_type"].get("financial", 0) == 0:
             logger.warning("No financial documents found. Please import some financial PDFs first.")
     
+    def _document_stats(self) -> Dict[str, Any]:
+        """Document store statistics, recomputed only after the store changes."""
+        version = self.doc_store.version
+        if version not in self._stats_cache:
+            self._stats_cache = {version: self.doc_store.get_document_stats()}
+        return self._stats_cache[version]
+    
+    def _financial_documents(self) -> List[Dict[str, Any]]:
+        """Financial documents in the store, reloaded only after the store changes."""
+        version = self.doc_store.version
+        if version not in self._financial_docs_cache:
+            self._financial_docs_cache = {version: self.doc_store.get_documents_by_type("financial")}
+        return self._financial_docs_cache[version]
+    
     def build_test_queries(self) -> List[Dict[str, Any]]:
         """
-        Build a list of test queries based on available documents.
+        Generate test queries based on available documents.
         Each query includes expected information to look for in the refined result.
         
+        A query generated for several documents appears once, with all of
+        their IDs in "document_ids", so it is only refined once.
+        
         Returns:
             List of test query objects
         """
-        test_queries = []
+        # Per-document queries keyed by query text, in first-seen order
+        by_query: Dict[str, Dict[str, Any]] = {}
+        
+        def _add(query: str, expected_terms: List[str], doc_id: str) -> None:
+            test = by_query.get(query)
+            if test is None:
+                by_query[query] = {
+                    "query": query,
+                    "expected_terms": expected_terms,
+                    "expected_terms_lc": [term.lower() for term in expected_terms],
+                    "document_ids": [doc_id]
+                }
+            else:
+                test["document_ids"].append(doc_id)
         
         # Get all financial documents
-        financial_docs = self.doc_store.get_documents_by_type("financial")
+        financial_docs = self._financial_documents()
         
         # For each document, create targeted queries
         for doc in financial_docs:
@@ -50,207 +151,206 @@ class PDFAccuracyTester:
             metadata = doc["metadata"]
             
             # Build queries based on metadata
-            if "fiscal_year" in metadata:
-                fiscal_year = metadata["fiscal_year"]
-                
+            fiscal_year = metadata.get("fiscal_year")
+            if fiscal_year is not None:
                 # Financial performance query
-                test_queries.append({
-                    "query": f"What were HPE's financial results in FY{fiscal_year}?",
-                    "expected_terms": [fiscal_year, "revenue", "growth"],
-                    "document_id": doc_id
-                })
-            
-            if "quarter" in metadata and "fiscal_year" in metadata:
-                quarter = metadata["quarter"]
-                fiscal_year = metadata["fiscal_year"]
+                _add(f"What were HPE's financial results in FY{fiscal_year}?",
+                     [fiscal_year, "revenue", "growth"], doc_id)
                 
-                # Quarterly performance query
-                test_queries.append({
-                    "query": f"What was HPE's performance in {quarter} {fiscal_year}?",
-                    "expected_terms": [quarter, fiscal_year, "revenue"],
-                    "document_id": doc_id
-                })
-            
-            # Check for specific business segments
-            if metadata.get("contains_greenlake", False):
-                test_queries.append({
-                    "query": "How is HPE's GreenLake business performing?",
-                    "expected_terms": ["GreenLake", "as-a-service", "growth"],
-                    "document_id": doc_id
-                })
-            
-            if metadata.get("contains_intelligent_edge", False):
-                test_queries.append({
-                    "query": "What is the revenue for HPE's Intelligent Edge segment?",
-                    "expected_terms": ["Intelligent Edge", "revenue", "growth"],
-                    "document_id": doc_id
-                })
+                quarter = metadata.get("quarter")
+                if quarter is not None:
+                    # Quarterly performance query
+                    _add(f"What was HPE's performance in {quarter} {fiscal_year}?",
+                         [quarter, fiscal_year, "revenue"], doc_id)
             
-            if metadata.get("contains_hpc", False):
-                test_queries.append({
-                    "query": "How is HPE's HPC & AI business segment performing?",
-                    "expected_terms": ["HPC", "AI", "revenue"],
-                    "document_id": doc_id
-                })
-            
-            # Add a few generic financial queries
-            if metadata.get("contains_arr", False):
-                test_queries.append({
-                    "query": "What is HPE's ARR?",
-                    "expected_terms": ["ARR", "recurring", "revenue"],
-                    "document_id": doc_id
-                })
+            # Business segment and ARR queries, one table lookup per flag
+            for flag, query, expected_terms in _SEGMENT_QUERIES:
+                if metadata.get(flag):
+                    _add(query, list(expected_terms), doc_id)
+        
+        test_queries = list(by_query.values())
         
         # Add some generic queries that don't target specific documents
         test_queries.extend([
             {
                 "query": "What was HPE's revenue in the last fiscal year?",
                 "expected_terms": ["revenue", "billion", "fiscal"],
-                "document_id": None
+                "expected_terms_lc": ["revenue", "billion", "fiscal"],
+                "document_ids": []
             },
             {
                 "query": "How much did GreenLake revenue grow?",
                 "expected_terms": ["GreenLake", "growth", "percent"],
-                "document_id": None
+                "expected_terms_lc": ["greenlake", "growth", "percent"],
+                "document_ids": []
             },
             {
                 "query": "What is HPE's dividend policy?",
                 "expected_terms": ["dividend", "capital", "shareholders"],
-                "document_id": None
+                "expected_terms_lc": ["dividend", "capital", "shareholders"],
+                "document_ids": []
             }
         ])
         
         return test_queries
     
-    def run_accuracy_test(self, test_queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _refine(self, query: str) -> Tuple[Dict[str, Any], float]:
+        """
+        Refine a test query once the rate limiter allows another model call.
+        
+        Returns:
+            Tuple of (refinement result, seconds spent in the model call)
+        """
+        self.rate_limiter.acquire()
+        start_time = time.perf_counter()
+        refinement_result = self.refiner.refine_query(query, use_rag=True)
+        end_time = time.perf_counter()
+        return refinement_result, end_time - start_time
+    
+    def run_accuracy_test(self, test_queries: List[Dict[str, Any]],
+                          workers: int = DEFAULT_WORKERS) -> List[AccuracyResult]:
         """
         Run the accuracy test on a set of test queries.
         
+        Refinements run on a thread pool; scoring happens afterwards, in
+        input order.
+        
         Args:
             test_queries: List of test query objects
+            workers: Number of queries refined concurrently
             
         Returns:
             List of test results
         """
+        # Bind the per-query lookups once rather than on every call
+        refine = self._refine
+        log_info = logger.info
+        total = len(test_queries)
+        
+        def _run(i: int, test: Dict[str, Any]) -> Any:
+            log_info(f"Running test {i}/{total}: {test['query']}")
+            try:
+                return refine(test["query"])
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            outcomes = list(executor.map(_run, range(1, total + 1), test_queries))
+        
         results = []
         
-        for i, test in enumerate(test_queries, 1):
+        for test, outcome in zip(test_queries, outcomes):
             query = test["query"]
             expected_terms = test["expected_terms"]
             
-            logger.info(f"Running test {i}/{len(test_queries)}: {query}")
-            
             try:
-                # Refine the query
-                start_time = time.time()
-                refinement_result = self.refiner.refine_query(query, use_rag=True)
-                end_time = time.time()
+                if isinstance(outcome, Exception):
+                    raise outcome
+                refinement_result, processing_time = outcome
                 
                 refined_query = refinement_result["refined_query"]
-                processing_time = end_time - start_time
                 
                 # Check for expected terms in refined query
-                term_matches = []
-                for term in expected_terms:
-                    if term.lower() in refined_query.lower():
-                        term_matches.append(term)
+                term_matches = match_expected_terms(refined_query, expected_terms,
+                                                    test.get("expected_terms_lc"))
                 
                 accuracy = len(term_matches) / len(expected_terms) if expected_terms else 0
                 
                 # Store the results
-                result = {
-                    "original_query": query,
-                    "refined_query": refined_query,
-                    "expected_terms": expected_terms,
-                    "matched_terms": term_matches,
-                    "accuracy": accuracy,
-                    "processing_time": processing_time,
-                    "document_id": test.get("document_id")
-                }
-                
-                results.append(result)
+                results.append(AccuracyResult(
+                    original_query=query,
+                    refined_query=refined_query,
+                    expected_terms=expected_terms,
+                    matched_terms=term_matches,
+                    accuracy=accuracy,
+                    processing_time=processing_time,
+                    document_ids=test.get("document_ids", [])
+                ))
                 
-                logger.info(f"Accuracy: {accuracy:.2f} ({len(term_matches)}/{len(expected_terms)} terms)")
-                
-                # Pause briefly between queries
-                if i < len(test_queries):
-                    time.sleep(1)
+                log_info(f"Accuracy: {accuracy:.2f} ({len(term_matches)}/{len(expected_terms)} terms) for: {query}")
                 
             except Exception as e:
                 logger.error(f"Error processing query '{query}': {e}")
-                results.append({
-                    "original_query": query,
-                    "error": str(e),
-                    "expected_terms": expected_terms,
-                    "matched_terms": [],
-                    "accuracy": 0,
-                    "processing_time": 0,
-                    "document_id": test.get("document_id")
-                })
+                results.append(AccuracyResult(
+                    original_query=query,
+                    error=str(e),
+                    expected_terms=expected_terms,
+                    document_ids=test.get("document_ids", [])
+                ))
         
         return results
     
-    def generate_accuracy_report(self, results: List[Dict[str, Any]], output_file: str = None) -> str:
+    def generate_accuracy_report(self, results: List[AccuracyResult], output_file: str = None) -> str:
         """
         Generate a report on accuracy test results.
         
         Args:
             results: The test results
-            output_file: Optional file to save the report to
+            output_file: Optional file to save the report to; the results are
+                also written as JSON to output_file + ".json"
             
         Returns:
             Report text
         """
-        # Calculate statistics
-        total_tests = len(results)
-        successful_tests = sum(1 for r in results if "error" not in r)
-        failed_tests = total_tests - successful_tests
-        
-        total_accuracy = sum(r.get("accuracy", 0) for r in results) / total_tests if total_tests > 0 else 0
-        avg_processing_time = sum(r.get("processing_time", 0) for r in results) / total_tests if total_tests > 0 else 0
-        
-        # Build the report
-        report = []
-        report.append("# HPE PDF Document Accuracy Test Report")
-        report.append(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append(f"Model: {self.refiner.model_name}")
-        report.append("")
+        # Render the detailed results and total the summary figures in one pass
+        successful_tests = 0
+        accuracy_sum = 0
+        time_sum = 0
+        details = io.StringIO()
         
-        report.append("## Summary")
-        report.append(f"- Total Tests: {total_tests}")
-        report.append(f"- Successful Tests: {successful_tests}")
-        report.append(f"- Failed Tests: {failed_tests}")
-        report.append(f"- Average Accuracy: {total_accuracy:.2f} (0-1 scale)")
-        report.append(f"- Average Processing Time: {avg_processing_time:.2f} seconds")
-        report.append("")
-        
-        report.append("## Document Statistics")
-        report.append(f"- Total Documents: {self.stats['total_documents']}")
-        for doc_type, count in self.stats["by_type"].items():
-            report.append(f"- {doc_type.capitalize()}: {count}")
-        report.append("")
-        
-        report.append("## Detailed Results")
         for i, result in enumerate(results, 1):
-            report.append(f"### Test {i}")
-            report.append(f"- Original Query: {result.get('original_query', 'N/A')}")
+            accuracy_sum += result.accuracy
+            time_sum += result.processing_time
             
-            if "error" in result:
-                report.append(f"- Error: {result['error']}")
+            lines = [
+                f"### Test {i}",
+                f"- Original Query: {result.original_query}",
+            ]
+            if result.error is not None:
+                lines.append(f"- Error: {result.error}")
             else:
-                report.append(f"- Refined Query: {result.get('refined_query', 'N/A')}")
-                report.append(f"- Expected Terms: {', '.join(result.get('expected_terms', []))}")
-                report.append(f"- Matched Terms: {', '.join(result.get('matched_terms', []))}")
-                report.append(f"- Accuracy: {result.get('accuracy', 0):.2f}")
-            
-            report.append(f"- Processing Time: {result.get('processing_time', 0):.2f} seconds")
-            
-            if result.get("document_id"):
-                report.append(f"- Target Document: {result['document_id']}")
+                successful_tests += 1
+                lines.append(f"- Refined Query: {result.refined_query}")
+                lines.append(f"- Expected Terms: {', '.join(result.expected_terms)}")
+                lines.append(f"- Matched Terms: {', '.join(result.matched_terms)}")
+                lines.append(f"- Accuracy: {result.accuracy:.2f}")
+            lines.append(f"- Processing Time: {result.processing_time:.2f} seconds")
+            if result.document_ids:
+                lines.append(f"- Target Documents: {', '.join(result.document_ids)}")
             
-            report.append("")
+            details.write("\n")
+            details.write("\n".join(lines))
+            details.write("\n")
         
-        report_text = "\n".join(report)
+        total_tests = len(results)
+        failed_tests = total_tests - successful_tests
+        total_accuracy = accuracy_sum / total_tests if total_tests > 0 else 0
+        avg_processing_time = time_sum / total_tests if total_tests > 0 else 0
+        
+        # Summary sections first, then the details rendered above
+        stats = self._document_stats()
+        buf = io.StringIO()
+        buf.write(
+            "# HPE PDF Document Accuracy Test Report\n"
+            f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"Model: {self.refiner.model_name}\n"
+            "\n"
+            "## Summary\n"
+            f"- Total Tests: {total_tests}\n"
+            f"- Successful Tests: {successful_tests}\n"
+            f"- Failed Tests: {failed_tests}\n"
+            f"- Average Accuracy: {total_accuracy:.2f} (0-1 scale)\n"
+            f"- Average Processing Time: {avg_processing_time:.2f} seconds\n"
+            "\n"
+            "## Document Statistics\n"
+            f"- Total Documents: {stats['total_documents']}\n"
+        )
+        for doc_type, count in stats["by_type"].items():
+            buf.write(f"- {doc_type.capitalize()}: {count}\n")
+        buf.write("\n## Detailed Results")
+        buf.write(details.getvalue())
+        
+        report_text = buf.getvalue()
         
         # Save to file if requested
         if output_file:
@@ -260,6 +360,15 @@ class PDFAccuracyTester:
                 logger.info(f"Report saved to {output_file}")
             except Exception as e:
                 logger.error(f"Error saving report to {output_file}: {e}")
+            
+            # Machine-readable copy of the results next to the report
+            results_file = output_file + ".json"
+            try:
+                with open(results_file, "wb") as f:
+                    f.write(_dumps(results))
+                logger.info(f"Results saved to {results_file}")
+            except Exception as e:
+                logger.error(f"Error saving results to {results_file}: {e}")
         
         return report_text
 
@@ -268,6 +377,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Test PDF Document Accuracy")
     parser.add_argument("--output", "-o", help="Output file for the report")
     parser.add_argument("--limit", "-l", type=int, help="Limit the number of test queries to run")
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of queries to run concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--rps", type=float, default=DEFAULT_RPS,
+                        help=f"Maximum model calls per second (default: {DEFAULT_RPS})")
     
     args = parser.parse_args()
     
@@ -278,7 +391,7 @@ if __name__ == "__main__":
         output_file = f"pdf_accuracy_report_{timestamp}.md"
     
     # Initialize the tester
-    tester = PDFAccuracyTester()
+    tester = PDFAccuracyTester(rps=args.rps)
     
     # Build test queries
     test_queries = tester.build_test_queries()
@@ -290,7 +403,7 @@ if __name__ == "__main__":
     print(f"Running {len(test_queries)} accuracy tests...")
     
     # Run the tests
-    results = tester.run_accuracy_test(test_queries)
+    results = tester.run_accuracy_test(test_queries, args.workers)
     
     # Generate the report
     report = tester.generate_accuracy_report(results, output_file)
@@ -1,13 +1,16 @@
+import io
 import json
 import time
 import os
 import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any
 
 from hpe_rag_query_refiner import HPERAGQueryRefiner
 from hpe_document_store import HPEDocumentStore
+from rate_limiter import TokenBucket, DEFAULT_RPS
 
 # Configure logging
 logging.basicConfig(
@@ -20,23 +23,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger("QueryTests")
 
+# Queries refined concurrently by default; model calls are still rate limited
+DEFAULT_WORKERS = 4
+
 class QueryTester:
     """
     Runs a battery of test queries against the HPE document database
     and evaluates the performance of the query refinement system.
     """
     
-    def __init__(self, use_rag: bool = True):
+    def __init__(self, use_rag: bool = True, rps: float = DEFAULT_RPS):
         """
         Initialize the query tester.
         
         Args:
             use_rag: Whether to use RAG for query refinement
+            rps: Maximum model calls per second
         """
         self.doc_store = HPEDocumentStore()
         self.refiner = HPERAGQueryRefiner(doc_store=self.doc_store)
         self.use_rag = use_rag
         
+        # Model calls only wait when the request budget is used up
+        self.rate_limiter = TokenBucket(rps)
+        
         # Check if we have documents
         stats = self.doc_store.get_document_stats()
         logger.info(f"Document store has {stats['total_documents']} documents")
@@ -54,9 +64,11 @@ class QueryTester:
         Returns:
             Dictionary with test results
         """
-        start_time = time.time()
+        # Time the model call itself, not the wait for the rate limiter
+        self.rate_limiter.acquire()
+        start_time = time.perf_counter()
         result = self.refiner.refine_query(query, use_rag=self.use_rag)
-        end_time = time.time()
+        end_time = time.perf_counter()
         
         processing_time = end_time - start_time
         
@@ -65,43 +77,47 @@ class QueryTester:
         
         return result
     
-    def run_test_queries(self, queries: List[str]) -> List[Dict[str, Any]]:
+    def run_test_queries(self, queries: List[str], workers: int = DEFAULT_WORKERS) -> List[Dict[str, Any]]:
         """
         Run a batch of test queries.
         
+        Queries run on a thread pool, since each one mostly waits on the
+        model API; results are returned in input order.
+        
         Args:
             queries: List of queries to test
+            workers: Number of queries refined concurrently
             
         Returns:
             List of test results
         """
-        results = []
+        # Bind the per-query lookups once rather than on every call
+        run_query = self.run_test_query
+        log_info = logger.info
+        total = len(queries)
         
-        for i, query in enumerate(queries, 1):
-            logger.info(f"Running test query {i}/{len(queries)}: {query}")
+        def _run(i: int, query: str) -> Dict[str, Any]:
+            log_info(f"Running test query {i}/{total}: {query}")
             
             try:
-                result = self.run_test_query(query)
-                results.append(result)
-                
-                logger.info(f"Original: {query}")
-                logger.info(f"Refined : {result['refined_query']}")
-                logger.info(f"Time    : {result['processing_time']:.2f} seconds")
+                result = run_query(query)
                 
-                # Pause briefly between queries to avoid rate limiting
-                if i < len(queries):
-                    time.sleep(1)
+                log_info(f"Original: {query}")
+                log_info(f"Refined : {result['refined_query']}")
+                log_info(f"Time    : {result['processing_time']:.2f} seconds")
+                return result
                 
             except Exception as e:
                 logger.error(f"Error processing query '{query}': {e}")
-                results.append({
+                return {
                     "original_query": query,
                     "refined_query": query,
                     "error": str(e),
                     "processing_time": 0
-                })
+                }
         
-        return results
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(executor.map(_run, range(1, total + 1), queries))
     
     def generate_report(self, results: List[Dict[str, Any]], output_file: str = None) -> str:
         """
@@ -114,50 +130,61 @@ class QueryTester:
         Returns:
             Report text
         """
-        # Calculate statistics
-        total_queries = len(results)
-        successful_queries = sum(1 for r in results if "error" not in r)
-        failed_queries = total_queries - successful_queries
-        
-        avg_time = sum(r.get("processing_time", 0) for r in results) / total_queries if total_queries > 0 else 0
-        
-        # Count how many used RAG
-        rag_used = sum(1 for r in results if r.get("used_rag", False))
+        # Render the detailed results and total the summary figures in one pass
+        successful_queries = 0
+        rag_used = 0
+        time_sum = 0
+        details = io.StringIO()
         
-        # Build the report
-        report = []
-        report.append("# HPE Query Refinement Test Report")
-        report.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append(f"RAG Enabled: {self.use_rag}")
-        report.append(f"Model: {self.refiner.model_name}")
-        report.append("")
-        
-        report.append("## Summary")
-        report.append(f"- Total Queries: {total_queries}")
-        report.append(f"- Successful: {successful_queries}")
-        report.append(f"- Failed: {failed_queries}")
-        report.append(f"- Average Processing Time: {avg_time:.2f} seconds")
-        report.append(f"- RAG Used: {rag_used}/{total_queries} queries")
-        report.append("")
-        
-        report.append("## Detailed Results")
         for i, result in enumerate(results, 1):
-            report.append(f"### Query {i}")
-            report.append(f"- Original: {result.get('original_query', 'N/A')}")
-            report.append(f"- Refined: {result.get('refined_query', 'N/A')}")
+            processing_time = result.get("processing_time", 0)
+            used_rag = result.get("used_rag", False)
+            time_sum += processing_time
+            if used_rag:
+                rag_used += 1
             
+            lines = [
+                f"### Query {i}",
+                f"- Original: {result.get('original_query', 'N/A')}",
+                f"- Refined: {result.get('refined_query', 'N/A')}",
+            ]
             if "error" in result:
-                report.append(f"- Error: {result['error']}")
-            
-            report.append(f"- Processing Time: {result.get('processing_time', 0):.2f} seconds")
-            report.append(f"- RAG Used: {result.get('used_rag', False)}")
-            
+                lines.append(f"- Error: {result['error']}")
+            else:
+                successful_queries += 1
+            lines.append(f"- Processing Time: {processing_time:.2f} seconds")
+            lines.append(f"- RAG Used: {used_rag}")
             if "context_length" in result:
-                report.append(f"- Context Length: {result['context_length']} characters")
+                lines.append(f"- Context Length: {result['context_length']} characters")
             
-            report.append("")
+            details.write("\n")
+            details.write("\n".join(lines))
+            details.write("\n")
+        
+        total_queries = len(results)
+        failed_queries = total_queries - successful_queries
+        avg_time = time_sum / total_queries if total_queries > 0 else 0
+        
+        # Summary first, then the details rendered above
+        buf = io.StringIO()
+        buf.write(
+            "# HPE Query Refinement Test Report\n"
+            f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"RAG Enabled: {self.use_rag}\n"
+            f"Model: {self.refiner.model_name}\n"
+            "\n"
+            "## Summary\n"
+            f"- Total Queries: {total_queries}\n"
+            f"- Successful: {successful_queries}\n"
+            f"- Failed: {failed_queries}\n"
+            f"- Average Processing Time: {avg_time:.2f} seconds\n"
+            f"- RAG Used: {rag_used}/{total_queries} queries\n"
+            "\n"
+            "## Detailed Results"
+        )
+        buf.write(details.getvalue())
         
-        report_text = "\n".join(report)
+        report_text = buf.getvalue()
         
         # Save to file if requested
         if output_file:
@@ -237,6 +264,10 @@ if __name__ == "__main__":
                         default="all", help="Query category to test")
     parser.add_argument("--limit", "-l", type=int, help="Limit the number of queries to run")
     parser.add_argument("--query", "-q", help="Run a specific query")
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of queries to run concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--rps", type=float, default=DEFAULT_RPS,
+                        help=f"Maximum model calls per second (default: {DEFAULT_RPS})")
     
     args = parser.parse_args()
     
@@ -270,12 +301,12 @@ if __name__ == "__main__":
         output_file = f"query_test_report_{timestamp}.md"
     
     # Initialize and run the tests
-    tester = QueryTester(use_rag=not args.no_rag)
+    tester = QueryTester(use_rag=not args.no_rag, rps=args.rps)
     
     print(f"Running {len(test_queries)} test queries...")
     
     # Run the queries
-    results = tester.run_test_queries(test_queries)
+    results = tester.run_test_queries(test_queries, args.workers)
     
     # Generate the report
     report = tester.generate_report(results, output_file)